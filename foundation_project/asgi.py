@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foundation_project.settings')
+# Serve the read-only public pages with the async views (main.async_views)
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from main.preload import EarlyHints  # noqa: E402 - needs the apps loaded
+
+# Send 103 Early Hints with each page's preload links before the view runs
+application = EarlyHints(django_application)
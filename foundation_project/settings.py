@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,16 +41,23 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.sitemaps',
     'main',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'main.middleware.CompressionMiddleware',
+    'main.middleware.PreloadMiddleware',
+    'main.middleware.ThrottleMiddleware',
+    'main.middleware.PageViewMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'main.middleware.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -70,16 +81,167 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foundation_project.wsgi.application'
 
+# Route the read-only public pages to main.async_views (set by asgi.py)
+ASYNC_PUBLIC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
+
+# Compile templates and build the URL resolver while the app loads (main.warmup), so with
+# gunicorn --preload every forked worker starts warm. gunicorn.conf.py does this (caches included)
+# from its when_ready hook, so it needs no DJANGO_WARMUP.
+WARMUP_ON_STARTUP = os.environ.get('DJANGO_WARMUP') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Select the database profile with DJANGO_DB_ENGINE=sqlite|postgresql.
+# SQLite connections are tuned (WAL, busy_timeout, ...) by main.db.configure_sqlite;
+# set SQLITE_PRAGMAS to override main.db.DEFAULT_SQLITE_PRAGMAS.
+
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'ajif'),
+            'USER': os.environ.get('DJANGO_DB_USER', 'ajif'),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DJANGO_DB_PORT', '5432'),
+            # Keep connections open between requests instead of reconnecting every time
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+    # Behind PgBouncer in transaction pooling mode server-side cursors must be off
+    if os.environ.get('DJANGO_DB_PGBOUNCER') == '1':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': {
+                # Seconds to wait for a lock held by another connection (the only busy timeout:
+                # main.db sets no busy_timeout PRAGMA)
+                'timeout': 20,
+            },
+            # File based test database so tests exercise the same WAL setup
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+
+# Read replicas for the public pages (main.routers.PrimaryReplicaRouter).
+# DJANGO_DB_REPLICA_HOSTS lists PostgreSQL replica hosts; DJANGO_DB_SQLITE_REPLICA
+# points a 'replica' alias at a second SQLite file for local testing.
+DATABASE_REPLICAS = []
+
+if DB_ENGINE == 'postgresql':
+    for index, host in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICA_HOSTS', '').split(','))):
+        alias = f'replica_{index}'
+        DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+        DATABASE_REPLICAS.append(alias)
+elif os.environ.get('DJANGO_DB_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DJANGO_DB_SQLITE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica')
+
+DATABASE_ROUTERS = ['main.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = 10  # how long a visitor reads from the primary after writing
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# The page cache, throttle counters and content versions have to be shared by every worker
+# process and by the management commands, so the cache is never per-process outside the tests.
+# DJANGO_CACHE_BACKEND=redis (default; DJANGO_REDIS_URL, needs the redis package), memcached
+# (DJANGO_MEMCACHED_LOCATION, needs pymemcache) or database (opt-in; the table is created by
+# migration main.0009 - on SQLite every throttled request and page rebuild becomes a write
+# competing with the site's own). main.checks refuses to start without a usable shared cache.
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'redis')
+TESTING = sys.argv[1:2] == ['test']
+
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ajif-test',
+        }
+    }
+elif CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('DJANGO_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'KEY_PREFIX': 'ajif',
+        }
+    }
+elif CACHE_BACKEND == 'memcached':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ.get('DJANGO_MEMCACHED_LOCATION', '127.0.0.1:11211'),
+            'KEY_PREFIX': 'ajif',
+        }
     }
+elif CACHE_BACKEND == 'database':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'ajif_cache',
+            'OPTIONS': {
+                # Cached pages, throttle windows and search results all live here
+                'MAX_ENTRIES': 10000,
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'DJANGO_CACHE_BACKEND must be redis, memcached or database, not {CACHE_BACKEND!r}')
+
+# Full-page cache for anonymous visitors (main.middleware.PageCacheMiddleware)
+PAGE_CACHE_TIMEOUT = 300  # seconds a cached page is served as fresh
+PAGE_CACHE_STALE_TIMEOUT = 3600  # extra seconds a stale page is served while one request rebuilds it
+PAGE_CACHE_LOCK_TIMEOUT = 30  # seconds the rebuild lock is held at most
+PAGE_CACHE_LOCK_WAIT = 2  # seconds a request waits for another to render a page that isn't cached yet
+FEED_CACHE_TIMEOUT = 86400  # seconds sitemap.xml and the feeds are kept (content changes replace them sooner)
+SEARCH_CACHE_TIMEOUT = 3600  # seconds a blog search's result IDs are kept (post changes expire them sooner)
+
+# Collapse whitespace in HTML responses before they are compressed (main.compression)
+HTML_MINIFY = os.environ.get('DJANGO_HTML_MINIFY', '1') == '1'
+
+# Preload the fonts and hero images in main.preload.CRITICAL_ASSETS: a Link header on every page,
+# plus 103 Early Hints under ASGI servers that support the http.response.early_hint extension
+PRELOAD_EARLY_HINTS = True
+
+# Anonymous POST throttling (main.middleware.ThrottleMiddleware): url name -> (requests, seconds) per IP
+THROTTLE_RATES = {
+    'contact': (5, 600),
+    'newsletter_subscribe': (5, 600),
+    'submit_testimonial': (3, 3600),
+    'donate': (10, 600),
 }
+# Reverse proxies in front of Django that append to X-Forwarded-For (0 = use REMOTE_ADDR)
+THROTTLE_PROXY_COUNT = int(os.environ.get('DJANGO_THROTTLE_PROXY_COUNT', '0'))
+
+# Views over their @query_budget log a warning; with this set they raise instead (the tests set it)
+QUERY_BUDGET_RAISE = False
+
+# Page-view log (main.analytics) - compacted into PageViewDaily by `manage.py rollup_pageviews`
+ANALYTICS_LOG_DIR = Path(os.environ.get('DJANGO_ANALYTICS_LOG_DIR', BASE_DIR / 'analytics'))
+ANALYTICS_BUFFER_SIZE = 100  # hits a process buffers before writing them out
+ANALYTICS_FLUSH_INTERVAL = 10  # seconds a buffered hit waits at most (checked on the next hit)
+# Off in the tests, so they don't leave logs behind - PageViewAnalyticsTest turns it on with a temporary directory
+ANALYTICS_ENABLED = not TESTING
 
 
 # Password validation
@@ -124,6 +286,23 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per unique content under media/cas/ (main.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'main.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Static copies of the public pages (python manage.py prerender_site)
+PRERENDER_ROOT = BASE_DIR / 'prerendered'
+PRERENDER_ON_SAVE = os.environ.get('DJANGO_PRERENDER_ON_SAVE') == '1'  # re-render affected pages on save
+
+# Allow bulk gallery uploads of a few hundred photos in one request
+DATA_UPLOAD_MAX_NUMBER_FILES = 1000
+
 # Authentication settings
 LOGIN_URL = 'blog_manager_login'
 LOGIN_REDIRECT_URL = 'blogmanagement'
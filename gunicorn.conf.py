@@ -0,0 +1,23 @@
+"""
+gunicorn settings, read from the working directory: `gunicorn foundation_project.wsgi`.
+
+The app is loaded once in the master (preload_app) and warmed up there
+(main.warmup) before the first worker is forked, so every worker starts with
+the templates compiled, the URL resolver built, the lazy modules imported and
+the shared caches primed.
+"""
+import os
+
+preload_app = True
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before any worker is forked"""
+    from django.db import connections
+
+    from main.warmup import warm_up
+
+    warm_up()
+    # Workers must not share the master's database connections
+    connections.close_all()
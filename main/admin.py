@@ -1,11 +1,19 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User, Group
+from django.db.models import Sum
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
+from . import publishing
+from .forms import GalleryBulkUploadForm, SubscriberImportForm
+from .gallery_ingest import ingest
 from .models import (
     Partner, BlogPost, Testimonial, ContactMessage,
-    Donation, NewsletterSubscriber, Gallery, SiteSettings
+    Donation, NewsletterSubscriber, Gallery, SiteSettings, MediaBlob, PageViewDaily
 )
+from .subscribers import import_subscribers, read_csv
 
 
 @admin.register(Partner)
@@ -64,23 +72,28 @@ class BlogPostAdmin(admin.ModelAdmin):
         }),
     )
 
-    actions = ['make_published', 'make_draft', 'make_featured']
+    actions = ['make_published', 'make_draft', 'make_featured', 'remove_featured']
 
     def make_published(self, request, queryset):
-        queryset.update(status='published')
-        self.message_user(request, f"{queryset.count()} posts published successfully.")
+        ids = publishing.publish(queryset)
+        self.message_user(request, f"{len(ids)} posts published successfully.")
     make_published.short_description = "Publish selected posts"
 
     def make_draft(self, request, queryset):
-        queryset.update(status='draft')
-        self.message_user(request, f"{queryset.count()} posts moved to draft.")
+        ids = publishing.unpublish(queryset)
+        self.message_user(request, f"{len(ids)} posts moved to draft.")
     make_draft.short_description = "Move to draft"
 
     def make_featured(self, request, queryset):
-        queryset.update(is_featured=True)
-        self.message_user(request, f"{queryset.count()} posts marked as featured.")
+        ids = publishing.set_featured(queryset)
+        self.message_user(request, f"{len(ids)} posts marked as featured.")
     make_featured.short_description = "Mark as featured"
 
+    def remove_featured(self, request, queryset):
+        ids = publishing.set_featured(queryset, featured=False)
+        self.message_user(request, f"{len(ids)} posts removed from featured.")
+    remove_featured.short_description = "Remove from featured"
+
 
 @admin.register(Testimonial)
 class TestimonialAdmin(admin.ModelAdmin):
@@ -213,6 +226,47 @@ class NewsletterSubscriberAdmin(admin.ModelAdmin):
         self.message_user(request, f"{queryset.count()} subscribers deactivated.")
     deactivate_subscribers.short_description = "Deactivate selected subscribers"
 
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='main_newslettersubscriber_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Import subscribers from an uploaded CSV file"""
+        if not self.has_add_permission(request):
+            messages.error(request, "You do not have permission to add subscribers.")
+            return redirect('admin:main_newslettersubscriber_changelist')
+
+        if request.method == 'POST':
+            form = SubscriberImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                stats = import_subscribers(
+                    read_csv(form.cleaned_data['csv_file']),
+                    update_names=form.cleaned_data['update_names'],
+                )
+                self.message_user(
+                    request,
+                    f"{stats['created']} subscribers imported, {stats['existing']} already subscribed.",
+                )
+                if stats['invalid'] or stats['duplicates']:
+                    self.message_user(
+                        request,
+                        f"{stats['invalid']} invalid emails and {stats['duplicates']} repeated rows were skipped.",
+                        level=messages.WARNING,
+                    )
+                return redirect('admin:main_newslettersubscriber_changelist')
+        else:
+            form = SubscriberImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import newsletter subscribers',
+            'opts': self.model._meta,
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/main/newslettersubscriber/import.html', context)
+
 
 @admin.register(Gallery)
 class GalleryAdmin(admin.ModelAdmin):
@@ -235,6 +289,91 @@ class GalleryAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_urls(self):
+        urls = [
+            path('bulk-upload/', self.admin_site.admin_view(self.bulk_upload_view), name='main_gallery_bulk_upload'),
+        ]
+        return urls + super().get_urls()
+
+    def bulk_upload_view(self, request):
+        """Upload many photos (or a ZIP of photos) as gallery items in one go"""
+        if not self.has_add_permission(request):
+            messages.error(request, "You do not have permission to add gallery images.")
+            return redirect('admin:main_gallery_changelist')
+
+        if request.method == 'POST':
+            form = GalleryBulkUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                created, rejected = ingest(
+                    files=form.cleaned_data['images'],
+                    archive=form.cleaned_data['archive'],
+                    category=form.cleaned_data['category'],
+                    partner=form.cleaned_data['partner'],
+                    blog_post=form.cleaned_data['blog_post'],
+                )
+                self.message_user(request, f"{len(created)} gallery images uploaded successfully.")
+                if rejected:
+                    self.message_user(
+                        request,
+                        f"{len(rejected)} files were skipped because they are not valid images: {', '.join(rejected[:10])}",
+                        level=messages.WARNING,
+                    )
+                return redirect('admin:main_gallery_changelist')
+        else:
+            form = GalleryBulkUploadForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Bulk upload gallery images',
+            'opts': self.model._meta,
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/main/gallery/bulk_upload.html', context)
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'size', 'ref_count', 'created_at']
+    ordering = ['-created_at']
+
+    def has_add_permission(self, request):
+        # Rows are managed by the media storage
+        return False
+
+
+@admin.register(PageViewDaily)
+class PageViewDailyAdmin(admin.ModelAdmin):
+    list_display = ['date', 'route', 'object_key', 'referrer_host', 'views']
+    list_filter = ['route', 'date']
+    search_fields = ['route', 'object_key', 'referrer_host']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'route', 'object_key', 'referrer_host', 'views']
+
+    # Days shown in the traffic chart above the list
+    CHART_DAYS = 30
+
+    def has_add_permission(self, request):
+        # Rows are written by rollup_pageviews
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        if not hasattr(response, 'context_data') or 'cl' not in response.context_data:
+            return response
+        # Daily totals of whatever the filters and search have selected
+        days = list(
+            response.context_data['cl'].queryset.order_by('-date').values('date')
+            .annotate(total=Sum('views'))[:self.CHART_DAYS]
+        )[::-1]
+        peak = max((day['total'] for day in days), default=0) or 1
+        response.context_data['traffic'] = [
+            {'date': day['date'], 'total': day['total'], 'percent': round(day['total'] * 100 / peak)}
+            for day in days
+        ]
+        return response
+
 
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(admin.ModelAdmin):
@@ -0,0 +1,196 @@
+"""
+Page-view analytics without a database write per hit.
+
+Each hit is a line (timestamp, route name, object, referrer host) appended to
+an in-memory buffer. The buffer is written to this process's log file in
+ANALYTICS_LOG_DIR every ANALYTICS_BUFFER_SIZE hits or ANALYTICS_FLUSH_INTERVAL
+seconds, whichever comes first. `manage.py rollup_pageviews` later compacts
+the logs into PageViewDaily counters for the admin.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .db import immediate_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows - fine for a single development server
+    fcntl = None
+
+
+# Pages counted when they are viewed (GET answered with 200)
+TRACKED_PAGES = {
+    'home', 'about', 'our_mission', 'our_partners', 'testimonials', 'submit_testimonial',
+    'blogs', 'blog_archive', 'blogpost', 'blogpost_detail', 'contact', 'donate',
+}
+# Forms counted when they are submitted successfully (POST answered with a redirect),
+# recorded with the object 'submitted' - next to the page views that makes a funnel
+TRACKED_FORMS = {'contact', 'donate', 'newsletter_subscribe', 'submit_testimonial'}
+
+FIELD_LENGTH = 200
+
+
+def log_dir():
+    return Path(getattr(settings, 'ANALYTICS_LOG_DIR', Path(settings.BASE_DIR) / 'analytics'))
+
+
+def clean(value):
+    # Tabs and newlines separate fields and lines
+    return ' '.join(str(value).split())[:FIELD_LENGTH]
+
+
+def referrer_host(request):
+    referrer = request.META.get('HTTP_REFERER', '')
+    try:
+        return (urlsplit(referrer).hostname or '') if referrer else ''
+    except ValueError:
+        return ''
+
+
+def hit_for(request, response):
+    """(route, object) to count for a response, or None"""
+    match = request.resolver_match
+    if match is None:
+        # Served by the page cache before URL resolution
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    route = match.url_name
+    if request.method == 'GET' and response.status_code == 200 and route in TRACKED_PAGES:
+        return route, '/'.join(str(value) for value in match.kwargs.values() if not isinstance(value, bool))
+    if request.method == 'POST' and 300 <= response.status_code < 400 and route in TRACKED_FORMS:
+        return route, 'submitted'
+    return None
+
+
+class HitLog:
+    """This process's buffer of hits and the log file it is written to"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    @property
+    def path(self):
+        return log_dir() / f'hits-{os.getpid()}.log'
+
+    def record(self, route, obj='', referrer='', now=None):
+        """Buffer one hit; returns True when the buffer is due to be written"""
+        if not getattr(settings, 'ANALYTICS_ENABLED', True):
+            return False
+        now = time.time() if now is None else now
+        line = f'{int(now)}\t{clean(route)}\t{clean(obj)}\t{clean(referrer)}\n'
+        with self.lock:
+            self.buffer.append(line)
+            return (
+                len(self.buffer) >= getattr(settings, 'ANALYTICS_BUFFER_SIZE', 100)
+                or time.monotonic() - self.last_flush >= getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 10)
+            )
+
+    def flush(self):
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if lines:
+            append_lines(self.path, ''.join(lines).encode('utf-8'))
+
+
+def append_lines(path, data):
+    """
+    Append to a log file in one write, under an exclusive lock.
+
+    rollup_pageviews renames a log before reading it; if that happened
+    between opening and locking, the write goes to a fresh file at the
+    original path instead of the one being rolled up.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            if current is None or current.st_ino != os.fstat(fd).st_ino:
+                continue
+            os.write(fd, data)
+            return
+        finally:
+            os.close(fd)
+
+
+hit_log = HitLog()
+atexit.register(hit_log.flush)
+
+
+def read_log(path):
+    """Yield (date, route, object, referrer host) from a log file, skipping damaged lines"""
+    with open(path, 'rb') as f:
+        if fcntl is not None:
+            # Wait for a write that started before the log was renamed
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        for raw in f:
+            parts = raw.decode('utf-8', 'replace').rstrip('\n').split('\t')
+            if len(parts) != 4 or not parts[0].isdigit():
+                continue
+            day = timezone.localdate(datetime.fromtimestamp(int(parts[0]), dt_timezone.utc))
+            yield day, parts[1], parts[2], parts[3]
+
+
+def rollup(directory=None):
+    """
+    Add every closed log's hits to the PageViewDaily counters and delete the logs.
+
+    Logs are renamed before they are read, so hits recorded meanwhile go to
+    new files and are left for the next run. A crash after the counters are
+    saved but before the logs are deleted counts those logs again on the next
+    run. Returns (hits, logs) processed.
+    """
+    from .models import PageViewDaily
+
+    directory = Path(directory or log_dir())
+    if not directory.exists():
+        return 0, 0
+    # Renamed logs an interrupted run left behind are picked up too
+    stamp = time.time_ns()
+    for path in directory.glob('hits-*.log'):
+        os.replace(path, path.with_name(f'{path.stem}-{stamp}.rolling'))
+    logs = sorted(directory.glob('hits-*.rolling'))
+
+    counts = Counter()
+    for path in logs:
+        counts.update(read_log(path))
+    if counts:
+        with immediate_atomic():
+            existing = {
+                (row.date, row.route, row.object_key, row.referrer_host): row
+                for row in PageViewDaily.objects.select_for_update().filter(date__in={key[0] for key in counts})
+            }
+            updated, created = [], []
+            for key, views in counts.items():
+                row = existing.get(key)
+                if row is not None:
+                    row.views += views
+                    updated.append(row)
+                else:
+                    day, route, obj, referrer = key
+                    created.append(PageViewDaily(date=day, route=route, object_key=obj, referrer_host=referrer, views=views))
+            PageViewDaily.objects.bulk_update(updated, ['views'], batch_size=500)
+            PageViewDaily.objects.bulk_create(created, batch_size=500)
+    for path in logs:
+        path.unlink()
+    return sum(counts.values()), len(logs)
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # Register signal handlers
+        from . import checks, signals  # noqa: F401
+        from .db import configure_sqlite
+        from .query_budget import install_query_counter
+        connection_created.connect(configure_sqlite, dispatch_uid='main.configure_sqlite')
+        connection_created.connect(install_query_counter, dispatch_uid='main.install_query_counter')
+
+        if settings.WARMUP_ON_STARTUP:
+            # Templates, URLs and imports only - querying the database while apps load is unsafe
+            from .warmup import warm_up
+            warm_up(caches=False)
@@ -0,0 +1,106 @@
+"""
+Blog archive index: published posts per (category, month).
+
+BlogArchiveMonth rows are recomputed for just the (category, month) pairs a
+write touches - on save and delete through the signals, and for bulk
+changes by main.publishing - so the blog pages read counts and archive
+links straight from the table and never GROUP BY at request time.
+"""
+import calendar
+from datetime import date, datetime, time
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import BlogArchiveMonth, BlogPost
+from .search import get_blog_content_version
+
+
+# Fields a post's archive entry depends on
+ARCHIVE_FIELDS = {'status', 'category', 'published_date'}
+
+# Months listed in the archive navigation
+NAV_MONTHS = 12
+
+
+def month_of(published_date):
+    """First day of the (site time zone) month a post was published in"""
+    return timezone.localtime(published_date).date().replace(day=1)
+
+
+def archive_key(category, published_date):
+    """(category, month) a post counts towards once published, or None without a date"""
+    if published_date is None:
+        return None
+    return category, month_of(published_date)
+
+
+def month_range(month):
+    """[start, end) datetimes of a month in the site time zone"""
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    days = calendar.monthrange(month.year, month.month)[1]
+    end = timezone.make_aware(datetime.combine(date.fromordinal(month.toordinal() + days), time.min))
+    return start, end
+
+
+def published_in(month):
+    """Published posts of one month - a range scan on (status, published_date)"""
+    start, end = month_range(month)
+    return BlogPost.objects.filter(status='published', published_date__gte=start, published_date__lt=end)
+
+
+def refresh(keys):
+    """Recompute the archive rows for some (category, month) pairs"""
+    for key in {key for key in keys if key is not None}:
+        category, month = key
+        count = published_in(month).filter(category=category).count()
+        if not count:
+            BlogArchiveMonth.objects.filter(category=category, month=month).delete()
+            continue
+        BlogArchiveMonth.objects.update_or_create(category=category, month=month, defaults={'post_count': count})
+
+
+def refresh_posts(ids):
+    """Recompute the archive rows the given posts count towards (after a bulk change)"""
+    rows = BlogPost.objects.filter(pk__in=ids).order_by().values_list('category', 'published_date').distinct()
+    refresh(archive_key(category, published_date) for category, published_date in rows)
+
+
+def rebuild():
+    """Recompute the whole index from the posts; returns the number of rows"""
+    keys = {
+        archive_key(category, published_date)
+        for category, published_date in BlogPost.objects.filter(status='published').values_list('category', 'published_date')
+    }
+    stale = [row.pk for row in BlogArchiveMonth.objects.all() if (row.category, row.month) not in keys]
+    BlogArchiveMonth.objects.filter(pk__in=stale).delete()
+    refresh(keys)
+    return BlogArchiveMonth.objects.count()
+
+
+def archive_nav():
+    """
+    Category counts and the latest months with posts, for the blog pages.
+
+    Read from the index table and cached until the next post change.
+    """
+    key = f'blog:archive-nav:{get_blog_content_version()}'
+    nav = cache.get(key)
+    if nav is None:
+        categories, months = {}, {}
+        for category, month, count in BlogArchiveMonth.objects.values_list('category', 'month', 'post_count'):
+            categories[category] = categories.get(category, 0) + count
+            months[month] = months.get(month, 0) + count
+        nav = {
+            'categories': [
+                {'value': value, 'label': label, 'count': categories[value]}
+                for value, label in BlogPost.CATEGORY_CHOICES if value in categories
+            ],
+            'months': [
+                {'month': month, 'count': months[month], 'url': reverse('blog_archive', args=[month.year, f'{month.month:02d}'])}
+                for month in sorted(months, reverse=True)[:NAV_MONTHS]
+            ],
+        }
+        cache.set(key, nav, None)
+    return nav
@@ -0,0 +1,162 @@
+"""
+Async versions of the read-only public views, used under ASGI.
+
+Independent queries for a page are started together with asyncio.gather.
+Templates still render in a thread because context processors may hit the
+database.
+"""
+import asyncio
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render
+
+from . import views
+from .models import BlogPost, Partner, Testimonial, Gallery
+from .query_budget import query_budget
+from .views import (
+    BLOG_IMAGES, NEWS_IMAGES, assign_default_images, listed_testimonials, post_cards,
+    split_testimonial_page, testimonial_filters, testimonial_page_rows, testimonial_type_counts,
+)
+from .archive import archive_nav
+from .search import search_results
+
+
+async def fetch(queryset):
+    """Evaluate a queryset with the async ORM"""
+    return [obj async for obj in queryset]
+
+
+async def render_async(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@query_budget(3)
+async def home(request):
+    """Homepage with featured content"""
+    featured_posts, partners, testimonials = await asyncio.gather(
+        fetch(BlogPost.objects.filter(status='published', is_featured=True).projection('listing')[:3]),
+        fetch(Partner.objects.filter(is_active=True).projection('card')[:4]),
+        fetch(Testimonial.objects.filter(is_approved=True, is_featured=True).projection('card')[:3]),
+    )
+
+    context = {
+        'featured_posts': featured_posts,
+        'partners': partners,
+        'testimonials': testimonials,
+    }
+    return await render_async(request, 'home.html', context)
+
+
+@query_budget(2)
+async def our_mission(request):
+    """Our mission page"""
+    testimonials, gallery_images = await asyncio.gather(
+        fetch(Testimonial.objects.filter(is_approved=True, testimonial_type='personal').projection('card')[:2]),
+        fetch(Gallery.objects.filter(is_featured=True, category='impact').projection('card')[:3]),
+    )
+
+    context = {
+        'testimonials': testimonials,
+        'gallery_images': gallery_images,
+    }
+    return await render_async(request, 'Our Mission.html', context)
+
+
+@query_budget(2)
+async def about(request):
+    """About page"""
+    partners, gallery_images = await asyncio.gather(
+        fetch(Partner.objects.filter(is_active=True).projection('card')),
+        fetch(Gallery.objects.filter(category='event').projection('card')[:6]),
+    )
+
+    context = {
+        'partners': partners,
+        'gallery_images': gallery_images,
+    }
+    return await render_async(request, 'about.html', context)
+
+
+@query_budget(1)
+async def our_partners(request):
+    """Partners page with all partner details"""
+    context = {
+        'partners': await fetch(Partner.objects.filter(is_active=True).projection('detail')),
+    }
+    return await render_async(request, 'our partners.html', context)
+
+
+@query_budget(2)
+async def testimonials(request):
+    """Testimonials page - the first page of them is rendered, the rest load on scroll"""
+    rows, counts = await asyncio.gather(
+        fetch(testimonial_page_rows(listed_testimonials(), 1)),
+        sync_to_async(testimonial_type_counts)(),
+    )
+    items, next_page = split_testimonial_page(rows, 1)
+    context = {
+        'testimonials': items,
+        'next_page': next_page,
+        'testimonial_filters': testimonial_filters(counts),
+    }
+    return await render_async(request, 'testimonials.html', context)
+
+
+@query_budget(4)
+async def blogs(request):
+    """Blog listing page with search and filtering"""
+    query = request.GET.get('q', '')
+    category = request.GET.get('category', '')
+    # Cached searches are a cache hit plus one IN lookup - not worth splitting up
+    db_blog_posts, db_news_posts = await sync_to_async(search_results)(query, category)
+
+    # No published posts - the sync view renders the dummy data
+    if not db_blog_posts and not db_news_posts:
+        return await sync_to_async(views.blogs)(request)
+
+    blog_posts = post_cards(db_blog_posts, BLOG_IMAGES)
+    news_posts = post_cards(db_news_posts, NEWS_IMAGES)
+
+    context = {
+        'blog_posts': blog_posts,
+        'news_posts': news_posts,
+        'query': query,
+        'category': category,
+        'total_pages': math.ceil(len(blog_posts) / 3),
+        'archive_nav': await sync_to_async(archive_nav)(),
+    }
+    return await render_async(request, 'blogs.html', context)
+
+
+@query_budget(3)
+async def blogpost(request, slug=None):
+    """Individual blog post detail page"""
+    published = BlogPost.objects.filter(status='published')
+    detail = published.projection('detail').select_related('author')
+
+    if slug:
+        post, latest = await asyncio.gather(
+            detail.filter(slug=slug).afirst(),
+            published.only('id').afirst(),
+        )
+        if post is None:
+            if latest is None:
+                # No published posts - the sync view renders the dummy data
+                return await sync_to_async(views.blogpost)(request, slug)
+            raise Http404('No BlogPost matches the given query.')
+    else:
+        # If no slug, show the latest post
+        post = await detail.afirst()
+        if post is None:
+            return await sync_to_async(views.blogpost)(request)
+
+    related_posts = await fetch(published.filter(category=post.category).exclude(id=post.id).projection('card')[:3])
+    assign_default_images(post, related_posts)
+
+    context = {
+        'post': post,
+        'related_posts': related_posts,
+    }
+    return await render_async(request, 'blogpost.html', context)
@@ -0,0 +1,176 @@
+"""
+In-memory prefix index over the published blog post titles, for search-as-you-type.
+
+Every suffix of a title that starts at a word ("empowering communities through
+education", "communities through education", ...) is kept in one sorted list
+of (key, post id) pairs, so a prefix lookup is a bisect plus a short scan and
+never touches the database.
+
+Saving or deleting a post updates this process's index in place once the
+transaction commits. Other processes notice the blog content version has moved
+on (every post change bumps it) and rebuild theirs on the next lookup.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+from django.urls import reverse
+
+from .models import BlogPost
+from .search import get_blog_content_version
+
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Matches looked at per lookup - enough to rank the best few of a short, common prefix
+MAX_SCAN = 200
+
+CATEGORIES = dict(BlogPost.CATEGORY_CHOICES)
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Lower-cased words without accents, joined by single spaces"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(WORD_RE.findall(text.casefold()))
+
+
+def title_keys(title):
+    words = normalize(title).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class PrefixIndex:
+    """
+    Sorted (key, post id) entries plus a dict of the posts they point at.
+
+    Updates build new lists and swap them in under a lock, so lookups never
+    need one - they always see a complete index, old or new.
+    """
+
+    def __init__(self, posts=(), version=None):
+        self.lock = threading.Lock()
+        self.version = version
+        self.posts = {}
+        entries = []
+        for post in posts:
+            self.posts[post['id']] = post
+            entries.extend((key, post['id']) for key in post['keys'])
+        self.entries = sorted(entries)
+
+    def add(self, post):
+        with self.lock:
+            entries = [entry for entry in self.entries if entry[1] != post['id']]
+            for key in post['keys']:
+                bisect.insort(entries, (key, post['id']))
+            posts = dict(self.posts)
+            posts[post['id']] = post
+            self.entries, self.posts = entries, posts
+
+    def remove(self, post_id):
+        with self.lock:
+            if post_id not in self.posts:
+                return
+            posts = dict(self.posts)
+            del posts[post_id]
+            self.entries = [entry for entry in self.entries if entry[1] != post_id]
+            self.posts = posts
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """The best `limit` posts with a title word sequence starting with query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        entries, posts = self.entries, self.posts
+        matches = {}
+        start = bisect.bisect_left(entries, (prefix,))
+        for key, post_id in entries[start:start + MAX_SCAN]:
+            if not key.startswith(prefix):
+                break
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            # Titles that start with the query first, then the newest posts
+            rank = (post['normalized'].startswith(prefix), post['published'])
+            matches[post_id] = max(rank, matches.get(post_id, rank))
+        best = sorted(matches, key=matches.get, reverse=True)[:limit]
+        return [posts[post_id] for post_id in best]
+
+
+def post_entry(post):
+    published = post.published_date or post.created_at
+    return {
+        'id': post.pk,
+        'title': post.title,
+        'url': reverse('blogpost_detail', args=[post.slug]),
+        'category': post.get_category_display(),
+        'normalized': normalize(post.title),
+        'keys': title_keys(post.title),
+        'published': published.timestamp() if published else 0,
+    }
+
+
+def build_index():
+    version = get_blog_content_version()
+    posts = (
+        BlogPost.objects.filter(status='published')
+        .only('title', 'slug', 'category', 'published_date', 'created_at')
+    )
+    return PrefixIndex((post_entry(post) for post in posts), version=version)
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def get_index():
+    """This process's index, rebuilt when another process changed the content"""
+    global _index
+    index = _index
+    if index is None or index.version != get_blog_content_version():
+        with _build_lock:
+            if _index is None or _index.version != get_blog_content_version():
+                _index = build_index()
+            index = _index
+    return index
+
+
+def post_changed(post, deleted=False):
+    """Apply one post's change to this process's index (other processes rebuild)"""
+    index = _index
+    if index is None:
+        return
+    if deleted or post.status != 'published':
+        index.remove(post.pk)
+    else:
+        index.add(post_entry(post))
+    # The save bumped the version once; if it moved further another process
+    # changed something too, so leave the index stale and rebuild it on the next lookup
+    version = get_blog_content_version()
+    if index.version is not None and version == index.version + 1:
+        index.version = version
+
+
+def category_suggestions(query):
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    return [
+        {'label': label, 'url': f'{reverse("blogs")}?category={value}'}
+        for value, label in CATEGORIES.items()
+        if any(word.startswith(prefix) for word in title_keys(label))
+    ]
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """Post and category suggestions for the search box"""
+    limit = max(1, min(limit, MAX_LIMIT))
+    return {
+        'posts': [
+            {'title': post['title'], 'url': post['url'], 'category': post['category']}
+            for post in get_index().search(query, limit)
+        ],
+        'categories': category_suggestions(query),
+    }
@@ -0,0 +1,57 @@
+"""
+Startup checks (`manage.py check`, runserver, migrate) for the shared cache.
+
+The page cache's rebuild lock, the throttle windows and the content versions
+only work when every worker process sees the same cache.
+"""
+import importlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connections, router
+
+# Backends each process keeps to itself
+PER_PROCESS_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+# Backends and the client package they import on first use
+CLIENT_PACKAGES = {
+    'django.core.cache.backends.redis.RedisCache': 'redis',
+    'django.core.cache.backends.memcached.PyMemcacheCache': 'pymemcache',
+}
+SHARED_CACHE_MIDDLEWARE = {'main.middleware.PageCacheMiddleware', 'main.middleware.ThrottleMiddleware'}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if getattr(settings, 'TESTING', False) or not SHARED_CACHE_MIDDLEWARE.intersection(settings.MIDDLEWARE):
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PER_PROCESS_BACKENDS:
+        return [Error(
+            f'The default cache ({backend}) is not shared between worker processes.',
+            hint='Set DJANGO_CACHE_BACKEND to redis or memcached (or database, to opt in to the database cache).',
+            id='main.E001',
+        )]
+    package = CLIENT_PACKAGES.get(backend)
+    if package is not None:
+        try:
+            importlib.import_module(package)
+        except ImportError:
+            return [Error(
+                f'The default cache ({backend}) needs the {package} package, which is not installed.',
+                hint=f'pip install {package}, or pick another DJANGO_CACHE_BACKEND.',
+                id='main.E002',
+            )]
+    if backend == 'django.core.cache.backends.db.DatabaseCache':
+        cache_model = caches['default'].cache_model_class
+        if connections[router.db_for_write(cache_model)].vendor == 'sqlite':
+            return [Warning(
+                'The database cache is on SQLite: throttled requests and page rebuilds write to the '
+                'same file as the site and wait on its lock.',
+                hint='Use DJANGO_CACHE_BACKEND=redis or memcached for more than a development server.',
+                id='main.W001',
+            )]
+    return []
@@ -0,0 +1,163 @@
+"""
+HTML minification and Brotli/gzip compression of responses.
+
+CompressionMiddleware minifies and compresses responses as they go out.
+PageCacheMiddleware stores a page already minified together with its
+compressed variants, so a cached page is compressed once, when it is
+stored, and every hit just picks the variant the browser accepts.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional - responses are then gzipped only
+    brotli = None
+
+
+# Smaller bodies aren't worth the compression overhead
+MIN_LENGTH = 200
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+)
+
+# Comments, and the elements whose whitespace matters (or that aren't HTML at all)
+RAW_BLOCK_RE = re.compile(
+    r'<!--.*?-->|<(?P<tag>pre|textarea|script|style)\b.*?</(?P=tag)\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+SPACE_RE = re.compile(r'\s+')
+INDENT_RE = re.compile(r'\n\s+')
+
+
+def collapse_space(match):
+    # One character keeps the spacing between inline elements; a newline keeps the lines
+    return '\n' if '\n' in match.group() else ' '
+
+
+def minify_html(html):
+    """
+    Collapse the whitespace in a page and drop its comments.
+
+    <pre>, <textarea> and <script> are left exactly as they are, <style>
+    only loses its indentation, and conditional comments are kept.
+    """
+    parts, text, position = [], '', 0
+    for match in RAW_BLOCK_RE.finditer(html):
+        # The text either side of a dropped comment is collapsed as one run
+        text += html[position:match.start()]
+        position = match.end()
+        block = match.group()
+        tag = (match.group('tag') or '').lower()
+        if not tag and not block.startswith('<!--[if'):
+            continue
+        if tag == 'style':
+            block = INDENT_RE.sub('\n', block)
+        parts += [SPACE_RE.sub(collapse_space, text), block]
+        text = ''
+    parts.append(SPACE_RE.sub(collapse_space, text + html[position:]))
+    return ''.join(parts)
+
+
+def is_html(response):
+    return response.get('Content-Type', '').startswith('text/html')
+
+
+def minified_content(response):
+    """The response body, minified when it's an HTML page"""
+    content = response.content
+    if not is_html(response) or not getattr(settings, 'HTML_MINIFY', True):
+        return content
+    try:
+        html = content.decode(response.charset)
+    except UnicodeDecodeError:
+        return content
+    return minify_html(html).encode(response.charset)
+
+
+def is_compressible(response, content):
+    if response.has_header('Content-Encoding') or len(content) < MIN_LENGTH:
+        return False
+    return response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(request, encodings=None):
+    """The encoding to send, from the request's Accept-Encoding - Brotli first - or None"""
+    encodings = available_encodings() if encodings is None else encodings
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().lower().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in ('br', 'gzip'):
+        if encoding in encodings and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, best=False):
+    """
+    Brotli or gzip compress content.
+
+    best is for bodies compressed once and served many times (the page
+    cache); responses compressed on the fly use a faster level.
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=11 if best else 5)
+    # mtime=0 so the same page always compresses to the same bytes
+    return gzip.compress(content, compresslevel=9 if best else 6, mtime=0)
+
+
+def encoded_variants(response, content):
+    """{encoding: compressed content} of a body, for the page cache"""
+    if not is_compressible(response, content):
+        return {}
+    return {encoding: compress(content, encoding, best=True) for encoding in available_encodings()}
+
+
+def set_content(response, content, encoding=None):
+    response.content = content
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    if response.has_header('Content-Length'):
+        response['Content-Length'] = str(len(content))
+
+
+def compress_response(request, response):
+    """Minify and compress a response for the browser that asked for it"""
+    if response.streaming or response.has_header('Content-Encoding'):
+        return
+    content = minified_content(response)
+    if not is_compressible(response, content):
+        if is_html(response):
+            set_content(response, content)
+        return
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = negotiate(request)
+    if encoding is None:
+        set_content(response, content)
+        return
+    compressed = compress(content, encoding)
+    # Incompressible content (already compressed, tiny) goes out as it is
+    if len(compressed) < len(content):
+        set_content(response, compressed, encoding)
+        if response.has_header('ETag'):
+            response['ETag'] = 'W/' + response['ETag'].removeprefix('W/')
+    else:
+        set_content(response, content)
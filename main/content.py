@@ -0,0 +1,181 @@
+import html
+import re
+import secrets
+from html.parser import HTMLParser
+
+from django.utils.html import linebreaks
+
+try:
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import TextLexer, get_lexer_by_name, guess_lexer
+    from pygments.util import ClassNotFound
+except ImportError:  # Pygments is optional - code blocks are then left unhighlighted
+    highlight = None
+
+
+# Tags and attributes blog content may use; everything else is stripped
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'div', 'em', 'figcaption', 'figure',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'mark', 'ol', 'p', 'pre',
+    's', 'small', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'th', 'thead',
+    'tr', 'u', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'id', 'title'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height', 'loading'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_URL_SCHEMES = ('http:', 'https:', 'mailto:', 'tel:')
+# Elements dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript'}
+VOID_TAGS = {'br', 'hr', 'img'}
+
+CODE_LANGUAGE_RE = re.compile(r'\blang(?:uage)?-([\w+#-]+)', re.IGNORECASE)
+
+
+def is_safe_url(url):
+    url = url.strip().lower()
+    return not url or url.startswith(('/', '#', '?')) or url.startswith(ALLOWED_URL_SCHEMES)
+
+
+class Sanitizer(HTMLParser):
+    """
+    Rebuilds HTML keeping only ALLOWED_TAGS and ALLOWED_ATTRIBUTES.
+
+    With a code_token, each <pre> element is taken out as a (code, language)
+    pair in code_blocks and replaced by f'{code_token}N{index}X' - in the
+    text, never inside an attribute value.
+    """
+
+    def __init__(self, code_token=None):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.skip_depth = 0
+        self.open_tags = []
+        self.code_token = code_token
+        self.code_blocks = []
+        # The code and language of the <pre> being read, if any
+        self.code = None
+        self.code_language = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.code is not None:
+            # Markup inside a code block only tells the language
+            if tag == 'code' and self.code_language is None:
+                language = CODE_LANGUAGE_RE.search(dict(attrs).get('class') or '')
+                self.code_language = language.group(1).lower() if language else None
+            return
+        if tag == 'pre' and self.code_token and not self.skip_depth:
+            self.code = []
+            return
+        if tag in DROP_CONTENT_TAGS:
+            self.skip_depth += 1
+            return
+        if self.skip_depth or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        parts = [tag]
+        opens_new_tab = tag == 'a' and ('target', '_blank') in attrs
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name == 'rel' and opens_new_tab:
+                continue
+            if name in URL_ATTRIBUTES and not is_safe_url(value):
+                continue
+            parts.append(f'{name}="{html.escape(value)}"')
+        if opens_new_tab:
+            parts.append('rel="noopener noreferrer"')
+        self.output.append(f'<{" ".join(parts)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in self.open_tags and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.code is not None:
+            if tag == 'pre':
+                self.end_code_block()
+            return
+        if tag in DROP_CONTENT_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+            return
+        if self.skip_depth or tag not in self.open_tags:
+            return
+        # Close anything left open inside this element
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.code is not None:
+            self.code.append(data)
+        elif not self.skip_depth:
+            self.output.append(html.escape(data, quote=False))
+
+    def end_code_block(self):
+        self.code_blocks.append((''.join(self.code).strip('\n'), self.code_language))
+        self.output.append(f'{self.code_token}N{len(self.code_blocks) - 1}X')
+        self.code = self.code_language = None
+
+    def get_html(self):
+        self.close()
+        if self.code is not None:
+            # A <pre> left open runs to the end of the content
+            self.end_code_block()
+        return ''.join(self.output) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+
+def sanitize_html(value):
+    parser = Sanitizer()
+    parser.feed(value)
+    return parser.get_html()
+
+
+def highlight_code(code, language=None):
+    """Highlight a code block server-side; returns the <pre> element"""
+    language_class = f' class="language-{html.escape(language)}"' if language else ''
+    if highlight is None:
+        return f'<pre><code{language_class}>{html.escape(code)}</code></pre>'
+    try:
+        lexer = get_lexer_by_name(language) if language else guess_lexer(code)
+    except ClassNotFound:
+        lexer = TextLexer()
+    body = highlight(code, lexer, HtmlFormatter(nowrap=True))
+    return f'<pre class="highlight"><code{language_class}>{body}</code></pre>'
+
+
+def render_content(content):
+    """
+    Turn BlogPost.content into the sanitised HTML shown on the detail page.
+
+    Does what the template used to do on every request (content|safe|linebreaks)
+    with the markup cleaned up and <pre> code blocks highlighted by Pygments.
+    """
+    # Code blocks stand aside under a token no author text can contain, so
+    # linebreaks() leaves them alone
+    token = f'AJIFCODEBLOCK{secrets.token_hex(8)}'
+    parser = Sanitizer(code_token=token)
+    parser.feed(content or '')
+    rendered = linebreaks(parser.get_html(), autoescape=False)
+    code_blocks = [highlight_code(code, language) for code, language in parser.code_blocks]
+    placeholder_re = re.compile(rf'(?:<p>)?{token}N(\d+)X(?:</p>)?')
+    return placeholder_re.sub(lambda m: code_blocks[int(m.group(1))], rendered)
+
+
+def highlight_css(selector='.blog-content .highlight', style='one-dark'):
+    """Stylesheet for the highlighted code blocks"""
+    if highlight is None:
+        return ''
+    rules = HtmlFormatter(style=style).get_style_defs(selector).splitlines()
+    # Drop Pygments' global pre/line-number rules - only the scoped ones are needed
+    return '\n'.join(rule for rule in rules if rule.startswith(selector)) + '\n'
@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+
+# PRAGMAs applied to every new SQLite connection. WAL lets readers carry on
+# while a write is in progress. How long a writer waits for the lock instead
+# of failing with "database is locked" is DATABASES OPTIONS['timeout'] alone -
+# a busy_timeout PRAGMA here would override it.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 134217728,  # 128 MB
+    'temp_store': 'MEMORY',
+}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created hook that tunes SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    # Straight on the DB-API connection: this is connection setup, not a query
+    # for the request that happened to open it (see main.query_budget)
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() for read-modify-write blocks.
+
+    On SQLite the outermost block starts with BEGIN IMMEDIATE, taking the
+    write lock (waiting up to the timeout) before the first read. After a
+    plain BEGIN the first write has to upgrade a read snapshot, and fails
+    with "database is locked" straight away if another connection wrote
+    since. Nested blocks and other databases get atomic() unchanged.
+    """
+    connection = transaction.get_connection(using)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    # Django 4.2 has no OPTIONS['transaction_mode'] (5.1), so replace the BEGIN atomic() sends
+    connection._start_transaction_under_autocommit = lambda: connection.cursor().execute('BEGIN IMMEDIATE')
+    try:
+        with transaction.atomic(using=using):
+            del connection._start_transaction_under_autocommit
+            yield
+    finally:
+        connection.__dict__.pop('_start_transaction_under_autocommit', None)
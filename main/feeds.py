@@ -0,0 +1,275 @@
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from .middleware import get_page_cache_version
+from .models import BlogPost, Gallery, Partner, Testimonial
+from .query_budget import query_budget
+
+
+# Public pages listed in the sitemap alongside the published posts
+SITEMAP_PAGES = ['home', 'about', 'our_mission', 'our_partners', 'testimonials', 'blogs']
+
+CATEGORIES = dict(BlogPost.CATEGORY_CHOICES)
+FEED_ITEMS = 20
+
+
+def published_posts():
+    return BlogPost.objects.filter(status='published')
+
+
+def blog_states():
+    """{category: (count, latest updated_at)} for the published posts, in one grouped query"""
+    rows = (
+        published_posts().order_by().values('category')
+        .annotate(count=Count('pk'), latest=Max('updated_at'))
+    )
+    return {row['category']: (row['count'], row['latest']) for row in rows}
+
+
+def category_state(category=None):
+    """(count, latest updated_at) for one category, or for all published posts"""
+    states = blog_states()
+    if category:
+        return states.get(category, (0, None))
+    return combine_states(states.values())
+
+
+def combine_states(states):
+    """Fold several (count, latest) pairs into one"""
+    states = list(states)
+    latest = [state[1] for state in states if state[1] is not None]
+    return sum(state[0] for state in states), max(latest, default=None)
+
+
+def pages_state():
+    """Everything the static pages show - posts, partners, testimonials and gallery images"""
+    sources = [
+        (published_posts(), 'updated_at'),
+        (Partner.objects.filter(is_active=True), 'updated_at'),
+        (Testimonial.objects.filter(is_approved=True), 'updated_at'),
+        (Gallery.objects.all(), 'created_at'),  # gallery images have no updated_at
+    ]
+    return combine_states(
+        tuple(qs.order_by().aggregate(count=Count('pk'), latest=Max(field)).values())
+        for qs, field in sources
+    )
+
+
+class PagesSitemap(Sitemap):
+    changefreq = 'weekly'
+    priority = 0.8
+
+    def __init__(self, state=None):
+        # (count, latest) when the caller has already looked it up
+        self.state = state
+
+    def items(self):
+        # Every page shares the newest content date - look it up once
+        latest = self.get_latest_lastmod()
+        return [(name, latest) for name in SITEMAP_PAGES]
+
+    def location(self, item):
+        return reverse(item[0])
+
+    def lastmod(self, item):
+        return item[1]
+
+    def get_latest_lastmod(self):
+        if self.state is None:
+            self.state = pages_state()
+        return self.state[1]
+
+
+class BlogPostSitemap(Sitemap):
+    changefreq = 'monthly'
+    priority = 0.6
+
+    def __init__(self, category, state=None):
+        self.category = category
+        self.state = state
+
+    def items(self):
+        return published_posts().filter(category=self.category).only('slug', 'updated_at').order_by('pk')
+
+    def lastmod(self, post):
+        return post.updated_at
+
+    def get_latest_lastmod(self):
+        if self.state is not None:
+            return self.state[1]
+        # The index only needs the newest date - don't load every post for it
+        return published_posts().filter(category=self.category).aggregate(latest=Max('updated_at'))['latest']
+
+    @property
+    def paginator(self):
+        paginator = super().paginator
+        if self.state is not None:
+            # The post count is known already - don't COUNT the section again
+            paginator.count = self.state[0]
+        return paginator
+
+
+# One sitemap section per blog category, so a post change only alters its own section
+SITEMAPS = {'pages': PagesSitemap()}
+SITEMAPS.update({f'blog-{category}': BlogPostSitemap(category) for category in CATEGORIES})
+
+
+class BlogFeed(Feed):
+    """RSS feed of the latest published posts, optionally for one category"""
+
+    def get_object(self, request, category=None):
+        if category is not None and category not in CATEGORIES:
+            raise Http404('Unknown category')
+        return category
+
+    def title(self, category):
+        if category:
+            return f'{CATEGORIES[category]} - Anila & Jawad Iqbal Foundation'
+        return 'Blog & News - Anila & Jawad Iqbal Foundation'
+
+    def link(self, category):
+        return reverse('blogs') + (f'?category={category}' if category else '')
+
+    def description(self, category):
+        if category:
+            return f'Latest {CATEGORIES[category].lower()} posts from the Anila & Jawad Iqbal Foundation'
+        return 'Latest posts from the Anila & Jawad Iqbal Foundation'
+
+    def items(self, category):
+        posts = published_posts().select_related('author').defer('content_html')
+        if category:
+            posts = posts.filter(category=category)
+        return posts[:FEED_ITEMS]
+
+    def item_title(self, post):
+        return post.title
+
+    def item_description(self, post):
+        return post.excerpt or Truncator(post.content).words(60, html=True)
+
+    def item_pubdate(self, post):
+        return post.published_date or post.created_at
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_author_name(self, post):
+        if post.author:
+            return post.author.get_full_name() or post.author.username
+        return None
+
+    def item_categories(self, post):
+        return [post.get_category_display()]
+
+
+class AtomBlogFeed(BlogFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, category):
+        return self.description(category)
+
+
+def cached_document(request, name, get_state, render):
+    """
+    Serve a sitemap or feed from the cache with ETag/Last-Modified.
+
+    Documents are cached per page cache version, so a hit costs no queries.
+    After a content change one aggregate query finds out whether this
+    document actually changed; its body is cached by that state, so only the
+    sections and feeds that were touched are rendered again, and crawlers
+    keep getting 304s for the rest.
+    """
+    timeout = getattr(settings, 'FEED_CACHE_TIMEOUT', 86400)
+    host = request.get_host()
+    key = f'feeds:{get_page_cache_version()}:{host}:{name}'
+    entry = cache.get(key)
+    if entry is None:
+        count, latest = get_state()
+        digest = hashlib.md5(f'{host}:{name}:{count}:{latest}'.encode('utf-8')).hexdigest()
+        body_key = f'feeds:body:{digest}'
+        entry = cache.get(body_key)
+        if entry is None:
+            response = render()
+            if hasattr(response, 'render'):
+                response.render()
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(digest),
+                'last_modified': int(latest.timestamp()) if latest else None,
+            }
+            cache.set(body_key, entry, timeout)
+        cache.set(key, entry, timeout)
+
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified']:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+    )
+
+
+@query_budget(5)
+def sitemap_index(request):
+    """sitemap.xml - lists the sections with their lastmod"""
+    states = {}
+
+    def state():
+        states['pages'] = pages_state()
+        states.update((f'blog-{category}', state) for category, state in blog_states().items())
+        return combine_states(states.values())
+
+    def render():
+        # Sections built from the states just looked up, so listing them costs no more queries
+        sitemaps = {'pages': PagesSitemap(states['pages'])}
+        sitemaps.update({
+            f'blog-{category}': BlogPostSitemap(category, states.get(f'blog-{category}', (0, None)))
+            for category in CATEGORIES
+        })
+        return sitemap_views.index(request, sitemaps, sitemap_url_name='sitemap_section')
+
+    return cached_document(request, 'sitemap', state, render)
+
+
+@query_budget(3)
+def sitemap_section(request, section):
+    """One section of the sitemap (static pages or one blog category)"""
+    if section not in SITEMAPS:
+        raise Http404('No such sitemap section')
+    if section == 'pages':
+        state = pages_state
+    else:
+        state = partial(category_state, SITEMAPS[section].category)
+
+    return cached_document(
+        request, f'sitemap-{section}', state,
+        lambda: sitemap_views.sitemap(request, SITEMAPS, section=section),
+    )
+
+
+@query_budget(2)
+def blog_feed(request, category=None, atom=False):
+    """RSS (or Atom) feed of the latest posts, for all posts or one category"""
+    if category is not None and category not in CATEGORIES:
+        raise Http404('Unknown category')
+    feed = AtomBlogFeed() if atom else BlogFeed()
+    kind = 'atom' if atom else 'rss'
+
+    return cached_document(
+        request, f'feed-{kind}-{category or "all"}', partial(category_state, category),
+        lambda: feed(request, category=category),
+    )
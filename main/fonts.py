@@ -0,0 +1,135 @@
+"""
+Subsetting the self-hosted web fonts down to the characters the site uses.
+
+`manage.py subset_fonts` collects every character in the rendered public
+pages and the published posts, writes a `<name>.subset.woff2` next to each
+font in fonts.css and adds an @font-face rule for it with a matching
+unicode-range. The full font stays declared first, so a character outside
+the subset (say, in a post written later) still renders - the browser only
+downloads the full file when a page actually needs one.
+"""
+import html
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.urls import reverse
+
+from . import prerender
+from .models import BlogPost
+
+try:
+    from fontTools import subset
+except ImportError:  # fontTools (and brotli, for WOFF2) are only needed to build the subsets
+    subset = None
+
+
+FONTS_CSS = 'assets/fonts/fonts.css'
+
+# Rendered for their text besides prerender.STATIC_PAGES
+EXTRA_PAGES = ['contact', 'donate', 'submit_testimonial']
+
+# Always kept, so new content in plain English never needs the full font
+BASE_CODEPOINTS = set(range(0x20, 0x7F)) | {0xA0, 0xA9, 0x2013, 0x2014, 0x2018, 0x2019, 0x201C, 0x201D, 0x2022, 0x2026}
+
+FONT_FACE_RE = re.compile(r'@font-face\s*\{[^}]*\}\s*', re.IGNORECASE)
+DESCRIPTOR_RE = re.compile(r'([\w-]+)\s*:\s*([^;]+);')
+URL_RE = re.compile(r"url\(\s*['\"]?([^'\")]+)['\"]?\s*\)")
+TAG_RE = re.compile(r'<[^>]*>')
+
+
+def fonts_css_path():
+    path = finders.find(FONTS_CSS)
+    return Path(path) if path else Path(settings.BASE_DIR) / 'templates' / 'static' / FONTS_CSS
+
+
+def page_text():
+    """The visible text of the public pages, as an anonymous visitor sees them"""
+    texts = []
+    for name in prerender.STATIC_PAGES + EXTRA_PAGES:
+        status, content = prerender.render_path(reverse(name))
+        if status == 200:
+            texts.append(html.unescape(TAG_RE.sub(' ', content.decode('utf-8'))))
+    return texts
+
+
+def post_text():
+    texts = []
+    for title, excerpt, content in BlogPost.objects.filter(status='published').values_list('title', 'excerpt', 'content'):
+        texts += [title, excerpt or '', html.unescape(TAG_RE.sub(' ', content))]
+    return texts
+
+
+def used_codepoints(texts):
+    codepoints = set(BASE_CODEPOINTS)
+    for text in texts:
+        codepoints.update(ord(char) for char in text if not char.isspace() or char == ' ')
+    return codepoints
+
+
+def unicode_range(codepoints):
+    """'U+20-7E, U+A0, ...' for a set of code points"""
+    ranges = []
+    for codepoint in sorted(codepoints):
+        if ranges and ranges[-1][1] == codepoint - 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+    return ', '.join(f'U+{start:X}' if start == end else f'U+{start:X}-{end:X}' for start, end in ranges)
+
+
+def font_faces(css):
+    """[(descriptors, font file name)] of the full fonts declared in fonts.css"""
+    faces = []
+    for block in FONT_FACE_RE.findall(css):
+        descriptors = dict((name.lower(), value.strip()) for name, value in DESCRIPTOR_RE.findall(block))
+        url = URL_RE.search(descriptors.get('src', ''))
+        # Rules with a unicode-range are the subsets an earlier run added
+        if url and 'unicode-range' not in descriptors:
+            faces.append((descriptors, url.group(1)))
+    return faces
+
+
+def subset_name(filename):
+    return f'{Path(filename).stem}.subset.woff2'
+
+
+def font_face_rule(descriptors, filename, codepoints=None):
+    lines = [f"  font-family: {descriptors['font-family']};", f"  src: url('{filename}') format('woff2');"]
+    for name in ('font-weight', 'font-style', 'font-display'):
+        if name in descriptors:
+            lines.append(f'  {name}: {descriptors[name]};')
+    if codepoints is not None:
+        lines.append(f'  unicode-range: {unicode_range(codepoints)};')
+    return '@font-face {\n' + '\n'.join(lines) + '\n}\n\n'
+
+
+def rewrite_css(css, faces, codepoints, subsetted):
+    """
+    fonts.css with each full font followed by its subset, for the fonts in
+    `subsetted` - of two rules the later one wins for the characters it covers.
+    """
+    rules = ''
+    for descriptors, filename in faces:
+        rules += font_face_rule(descriptors, filename)
+        if filename in subsetted:
+            rules += font_face_rule(descriptors, subset_name(filename), codepoints)
+    first = FONT_FACE_RE.search(css)
+    if first is None:
+        return rules + css
+    rest = FONT_FACE_RE.sub('', css[first.start():])
+    return css[:first.start()] + rules + rest
+
+
+def subset_font(source, target, codepoints):
+    """Write a WOFF2 of source with just the given characters (keeping kerning and ligatures)"""
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.notdef_outline = True
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    subset.save_font(font, str(target), options)
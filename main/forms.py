@@ -1,5 +1,7 @@
+import zipfile
+
 from django import forms
-from .models import ContactMessage, NewsletterSubscriber, Testimonial, Donation
+from .models import ContactMessage, Testimonial, Donation, Gallery, Partner, BlogPost
 
 
 class ContactForm(forms.ModelForm):
@@ -35,21 +37,16 @@ class ContactForm(forms.ModelForm):
         }
 
 
-class NewsletterForm(forms.ModelForm):
-    """Form for newsletter subscription"""
-    class Meta:
-        model = NewsletterSubscriber
-        fields = ['email', 'name']
-        widgets = {
-            'email': forms.EmailInput(attrs={
-                'class': 'w-full px-4 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-teal-500',
-                'placeholder': 'Enter your email'
-            }),
-            'name': forms.TextInput(attrs={
-                'class': 'w-full px-4 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-teal-500',
-                'placeholder': 'Your Name (Optional)'
-            }),
-        }
+class NewsletterForm(forms.Form):
+    """Form for newsletter subscription - saved with main.subscribers.subscribe()"""
+    email = forms.EmailField(widget=forms.EmailInput(attrs={
+        'class': 'w-full px-4 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-teal-500',
+        'placeholder': 'Enter your email'
+    }))
+    name = forms.CharField(max_length=200, required=False, widget=forms.TextInput(attrs={
+        'class': 'w-full px-4 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-teal-500',
+        'placeholder': 'Your Name (Optional)'
+    }))
 
 
 class TestimonialForm(forms.ModelForm):
@@ -120,3 +117,56 @@ class DonationForm(forms.ModelForm):
                 'class': 'w-4 h-4 text-teal-600 focus:ring-teal-500 border-gray-300 rounded'
             }),
         }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The select only shows partner names
+        self.fields['partner'].queryset = Partner.objects.projection('choice')
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.FileField):
+    """File field that accepts several files from one input"""
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput(attrs={'accept': 'image/*'}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_clean(d, initial) for d in data]
+        return [single_clean(data, initial)] if data else []
+
+
+class GalleryBulkUploadForm(forms.Form):
+    """Admin form for uploading many gallery images at once"""
+    images = MultipleImageField(required=False, help_text="Select any number of photos")
+    archive = forms.FileField(required=False, help_text="Or upload a ZIP file of photos",
+                              widget=forms.FileInput(attrs={'accept': '.zip,application/zip'}))
+    category = forms.ChoiceField(choices=Gallery.GALLERY_CATEGORY_CHOICES, initial='event')
+    partner = forms.ModelChoiceField(queryset=Partner.objects.all(), required=False)
+    blog_post = forms.ModelChoiceField(queryset=BlogPost.objects.all(), required=False)
+
+    def clean_archive(self):
+        archive = self.cleaned_data.get('archive')
+        if archive and not zipfile.is_zipfile(archive):
+            raise forms.ValidationError("The uploaded file is not a ZIP archive.")
+        if archive:
+            archive.seek(0)
+        return archive
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('images') and not cleaned_data.get('archive'):
+            raise forms.ValidationError("Choose some photos or a ZIP archive to upload.")
+        return cleaned_data
+
+
+class SubscriberImportForm(forms.Form):
+    """Admin form for importing newsletter subscribers from a CSV file"""
+    csv_file = forms.FileField(label="CSV file", help_text="Columns: email and (optionally) name",
+                               widget=forms.FileInput(attrs={'accept': '.csv,text/csv'}))
+    update_names = forms.BooleanField(required=False, help_text="Overwrite the names of existing subscribers")
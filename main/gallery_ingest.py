@@ -0,0 +1,145 @@
+import logging
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .images import placeholder
+from .models import Gallery
+from .signals import refresh_public_content
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+def title_from_filename(filename):
+    """'event_day-01.jpg' -> 'Event Day 01'"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem.replace('_', ' ').replace('-', ' ').strip().title()[:200] or 'Gallery Image'
+
+
+def is_image_name(filename):
+    return os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS
+
+
+def iter_zip_members(archive):
+    """
+    Yield (filename, file object) for the images in a ZIP upload.
+
+    Members are opened one at a time and read in chunks while they are
+    copied to storage, so the archive is never loaded into memory.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            name = os.path.basename(info.filename)
+            # Skip folders, macOS metadata and anything that isn't an image
+            if info.is_dir() or name.startswith('.') or '__MACOSX' in info.filename or not is_image_name(name):
+                continue
+            with zf.open(info) as member:
+                yield name, member
+
+
+def store_file(filename, fileobj):
+    """Save an uploaded image under Gallery.image's upload_to; returns the storage name"""
+    name = Gallery._meta.get_field('image').generate_filename(None, filename)
+    return default_storage.save(name, File(fileobj, name=filename))
+
+
+def inspect_image(path):
+    """
+    Decode an image fully and return (path, width, height, placeholder), or
+    (path, None, None, '') when it isn't a valid image. Runs in a worker process.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(path) as im:
+            im.verify()
+        # verify() leaves the image unusable - reopen to decode the pixel data
+        if hasattr(path, 'seek'):
+            path.seek(0)
+        with Image.open(path) as im:
+            im.load()
+            # Measured the way browsers show it, as main.images does for single uploads
+            im = ImageOps.exif_transpose(im)
+            return path, im.width, im.height, placeholder(im)
+    except Exception:
+        return path, None, None, ''
+
+
+def validate_images(names, workers=None):
+    """
+    {storage name: (width, height, placeholder)} for the stored names that
+    are valid images, checked in a process pool.
+    """
+    try:
+        paths = {default_storage.path(name): name for name in names}
+    except NotImplementedError:
+        # Remote storage - no local paths to hand to worker processes
+        measured = {name: _inspect_stored(name) for name in names}
+        return {name: values for name, values in measured.items() if values[0]}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(inspect_image, paths, chunksize=8)
+        return {paths[path]: (width, height, data_uri) for path, width, height, data_uri in results if width}
+
+
+def _inspect_stored(name):
+    with default_storage.open(name) as fileobj:
+        return inspect_image(fileobj)[1:]
+
+
+def ingest(files=(), archive=None, category='event', partner=None, blog_post=None, workers=None):
+    """
+    Store uploaded images (a list of files and/or a ZIP archive), validate
+    them in parallel and create their Gallery rows in one bulk_create.
+
+    Returns (created, rejected) where rejected lists the file names that
+    were not valid images.
+    """
+    stored = []  # (storage name, original file name) - names repeat for duplicate photos
+    rejected = []
+
+    uploads = [(f.name, f) for f in files]
+    sources = [uploads]
+    if archive is not None:
+        sources.append(iter_zip_members(archive))
+
+    for source in sources:
+        for filename, fileobj in source:
+            if not is_image_name(filename):
+                rejected.append(filename)
+                continue
+            stored.append((store_file(filename, fileobj), filename))
+
+    names = list(dict.fromkeys(name for name, filename in stored))
+    valid = validate_images(names, workers=workers) if names else {}
+    for name, filename in stored:
+        if name not in valid:
+            rejected.append(filename)
+            default_storage.delete(name)
+
+    items = [
+        Gallery(
+            title=title_from_filename(filename),
+            image=name,
+            # bulk_create skips pre_save, so the measurements come from validation
+            image_width=valid[name][0],
+            image_height=valid[name][1],
+            image_placeholder=valid[name][2],
+            category=category,
+            partner=partner,
+            blog_post=blog_post,
+        )
+        for name, filename in stored if name in valid
+    ]
+    created = Gallery.objects.bulk_create(items, batch_size=200)
+    # bulk_create doesn't send post_save
+    if created:
+        refresh_public_content(created[0])
+    logger.info('Gallery ingest: %d created, %d rejected', len(created), len(rejected))
+    return created, rejected
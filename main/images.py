@@ -0,0 +1,97 @@
+"""
+Image dimensions and blurred placeholders, measured once when an image is uploaded.
+
+An ImageField `<name>` is measured when its model also has `<name>_width`,
+`<name>_height` and `<name>_placeholder` fields. The sizes let templates give
+every <img> its width and height, so the layout doesn't shift as images
+load. The placeholder is a tiny blurred WebP, a few hundred bytes as a
+data: URI, shown until the image itself arrives. Pages never decode an
+image: `{% lazy_image %}` (main.templatetags.image_tags) only reads the
+stored values.
+"""
+import base64
+import io
+import logging
+
+from django.db.models import ImageField
+
+
+logger = logging.getLogger(__name__)
+
+# Longest side of the placeholder, in pixels - stretched and blurred by the browser anyway
+PLACEHOLDER_SIZE = 16
+
+
+def measured_fields(model):
+    """ImageFields of a model that have dimension and placeholder fields next to them"""
+    names = {field.name for field in model._meta.concrete_fields}
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, ImageField)
+        and {f'{field.name}_width', f'{field.name}_height', f'{field.name}_placeholder'} <= names
+    ]
+
+
+def placeholder(im):
+    """A tiny blurred copy of an opened image as a data: URI"""
+    from PIL import ImageFilter
+
+    small = im.convert('RGBA' if 'A' in im.getbands() else 'RGB')
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, 'WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def measure(fileobj):
+    """(width, height, placeholder) of an image file, or (None, None, '') when it isn't one"""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(fileobj) as im:
+            # Browsers apply the EXIF orientation, so measure the image the way it's shown
+            im = ImageOps.exif_transpose(im)
+            return im.width, im.height, placeholder(im)
+    except Exception:
+        logger.warning('Could not measure image %s', getattr(fileobj, 'name', fileobj), exc_info=True)
+        return None, None, ''
+    finally:
+        if hasattr(fileobj, 'seek'):
+            fileobj.seek(0)
+
+
+def set_measurements(instance, field, values):
+    width, height, data_uri = values
+    setattr(instance, f'{field.name}_width', width)
+    setattr(instance, f'{field.name}_height', height)
+    setattr(instance, f'{field.name}_placeholder', data_uri)
+
+
+def measure_field(instance, field):
+    """
+    Fill in the measurements of a new upload (before it is stored) or clear
+    them for an emptied field. Returns whether anything changed.
+    """
+    file = getattr(instance, field.attname)
+    if not file:
+        if getattr(instance, f'{field.name}_width') is None and not getattr(instance, f'{field.name}_placeholder'):
+            return False
+        set_measurements(instance, field, (None, None, ''))
+        return True
+    if file._committed:
+        # Already stored - measured at upload, or left to `manage.py measure_images`
+        return False
+    set_measurements(instance, field, measure(file.file))
+    return True
+
+
+def measure_stored(instance, field):
+    """Measure an image that is already in storage (backfill)"""
+    file = getattr(instance, field.attname)
+    with file.storage.open(file.name) as fileobj:
+        set_measurements(instance, field, measure(fileobj))
+
+
+def measurement_fields(field):
+    return [f'{field.name}_width', f'{field.name}_height', f'{field.name}_placeholder']
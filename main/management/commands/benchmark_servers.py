@@ -0,0 +1,146 @@
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+
+DEFAULT_PATHS = ['/', '/about/', '/our-mission/', '/our-partners/', '/testimonials/', '/blogs/']
+
+
+class Command(BaseCommand):
+    help = 'Compare WSGI and ASGI throughput of the public pages with many slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='both')
+        parser.add_argument('--requests', type=int, default=1000, help='Total number of requests')
+        parser.add_argument('--concurrency', type=int, default=200, help='Number of simultaneous clients')
+        parser.add_argument('--threads', type=int, default=16, help='WSGI worker threads')
+        parser.add_argument('--client-delay', type=float, default=0.2,
+                            help='Seconds a slow client takes to receive each response body chunk')
+        parser.add_argument('--with-page-cache', action='store_true',
+                            help='Keep PageCacheMiddleware enabled (it answers most requests from cache)')
+        parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable)')
+
+    def handle(self, *args, **options):
+        if options['server'] == 'both':
+            # The URLconf picks sync or async views at import, so each server runs in its own process
+            for server in ('wsgi', 'asgi'):
+                self.run_child(server, options)
+            return
+
+        middleware = list(settings.MIDDLEWARE)
+        if not options['with_page_cache']:
+            middleware.remove('main.middleware.PageCacheMiddleware')
+
+        paths = options['paths'] or DEFAULT_PATHS
+        urls = [paths[i % len(paths)] for i in range(options['requests'])]
+
+        with override_settings(MIDDLEWARE=middleware):
+            if options['server'] == 'wsgi':
+                latencies, elapsed = self.run_wsgi(urls, options['threads'], options['client_delay'])
+            else:
+                latencies, elapsed = asyncio.run(
+                    self.run_asgi(urls, options['concurrency'], options['client_delay'])
+                )
+        self.report(options['server'], latencies, elapsed)
+
+    def run_child(self, server, options):
+        args = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_servers',
+            f'--server={server}',
+            f'--requests={options["requests"]}',
+            f'--concurrency={options["concurrency"]}',
+            f'--threads={options["threads"]}',
+            f'--client-delay={options["client_delay"]}',
+        ]
+        if options['with_page_cache']:
+            args.append('--with-page-cache')
+        for path in options['paths'] or []:
+            args.append(f'--path={path}')
+        env = dict(os.environ, DJANGO_ASYNC_VIEWS='1' if server == 'asgi' else '0')
+        subprocess.run(args, env=env, check=True)
+
+    def run_wsgi(self, urls, threads, client_delay):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        handler = WSGIHandler()
+
+        def request(job):
+            path, started = job
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'HTTP_HOST': 'localhost',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(b''),
+                'wsgi.url_scheme': 'http',
+                'wsgi.errors': sys.stderr,
+            }
+            body = handler(environ, lambda status, headers: None)
+            # The worker thread stays busy while the slow client reads the response
+            for chunk in body:
+                time.sleep(client_delay)
+            body.close()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        # Every client arrives at once; queueing for a free thread counts towards latency
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(request, [(path, started) for path in urls]))
+        return latencies, time.perf_counter() - started
+
+    async def run_asgi(self, urls, concurrency, client_delay):
+        from django.core.handlers.asgi import ASGIHandler
+
+        handler = ASGIHandler()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def request(path):
+            started = time.perf_counter()
+            async with slots:
+                scope = {
+                    'type': 'http',
+                    'asgi': {'version': '3.0'},
+                    'http_version': '1.1',
+                    'method': 'GET',
+                    'scheme': 'http',
+                    'path': path,
+                    'root_path': '',
+                    'query_string': b'',
+                    'headers': [(b'host', b'localhost')],
+                    'client': ('127.0.0.1', 0),
+                    'server': ('localhost', 80),
+                }
+
+                async def receive():
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+                async def send(message):
+                    # The slow client only holds a coroutine, not a thread
+                    if message['type'] == 'http.response.body':
+                        await asyncio.sleep(client_delay)
+
+                await handler(scope, receive, send)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(request(path) for path in urls))
+        return latencies, time.perf_counter() - started
+
+    def report(self, server, latencies, elapsed):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(self.style.SUCCESS(f'{server.upper()}: {len(latencies) / elapsed:.1f} requests/s'))
+        self.stdout.write(f'  requests: {len(latencies)} in {elapsed:.2f}s')
+        self.stdout.write(f'  latency p50: {statistics.median(latencies) * 1000:.1f} ms, p95: {p95 * 1000:.1f} ms')
@@ -0,0 +1,39 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from main.signals import content_addressed_fields
+from main.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = 'Move existing uploads into content-addressed storage so identical files are stored once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Remove the old copies once every row points at the new name')
+
+    def handle(self, *args, **options):
+        moved = 0
+        originals = set()
+
+        for model in apps.get_app_config('main').get_models():
+            for field in content_addressed_fields(model):
+                rows = model._default_manager.exclude(**{field.attname: ''}).exclude(**{f'{field.attname}__isnull': True})
+                for pk, name in rows.values_list('pk', field.attname).iterator():
+                    if is_content_addressed(name):
+                        continue
+                    if not field.storage.exists(name):
+                        self.stdout.write(self.style.WARNING(f'Missing file for {model.__name__} #{pk}: {name}'))
+                        continue
+                    with field.storage.open(name) as fileobj:
+                        new_name = field.storage.save(name, fileobj)
+                    # update() skips save signals so nothing else is released
+                    model._default_manager.filter(pk=pk).update(**{field.attname: new_name})
+                    originals.add((field.storage, name))
+                    moved += 1
+
+        if options['delete_originals']:
+            for storage, name in originals:
+                storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} file reference(s) into content-addressed storage'))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.subscribers import BATCH_SIZE, import_subscribers, read_csv
+
+
+class Command(BaseCommand):
+    help = 'Import newsletter subscribers from a CSV file (email[,name]) in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the CSV file')
+        parser.add_argument('--update-names', action='store_true',
+                            help='Overwrite the name of subscribers that already exist')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['csv_file'], encoding='utf-8-sig', newline='') as fileobj:
+                stats = import_subscribers(
+                    read_csv(fileobj),
+                    update_names=options['update_names'],
+                    batch_size=options['batch_size'],
+                )
+        except OSError as e:
+            raise CommandError(f'Could not read {options["csv_file"]}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["created"]} new subscriber(s) in {time.perf_counter() - started:.1f}s'
+        ))
+        self.stdout.write(
+            f'  already subscribed: {stats["existing"]}, invalid: {stats["invalid"]}, '
+            f'repeated in file: {stats["duplicates"]}'
+        )
@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from main.images import measure_stored, measured_fields, measurement_fields
+
+
+class Command(BaseCommand):
+    help = 'Record the width, height and blurred placeholder of images uploaded before they were measured on upload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Measure every image again, not just the unmeasured ones')
+
+    def handle(self, *args, **options):
+        measured = 0
+        for model in apps.get_app_config('main').get_models():
+            for field in measured_fields(model):
+                rows = model._default_manager.exclude(**{field.attname: ''}).exclude(**{f'{field.attname}__isnull': True})
+                if not options['all']:
+                    rows = rows.filter(**{f'{field.name}_width__isnull': True})
+                for instance in rows.only('pk', field.attname).iterator():
+                    name = getattr(instance, field.attname).name
+                    if not field.storage.exists(name):
+                        self.stdout.write(self.style.WARNING(f'Missing file for {model.__name__} #{instance.pk}: {name}'))
+                        continue
+                    measure_stored(instance, field)
+                    # update() skips the save signals - the pages show the same images
+                    model._default_manager.filter(pk=instance.pk).update(
+                        **{name: getattr(instance, name) for name in measurement_fields(field)}
+                    )
+                    measured += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Measured {measured} image(s)'))
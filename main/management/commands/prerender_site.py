@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import prerender
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the public pages and published blog posts to static HTML for nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Number of render processes (default: CPU count)')
+        parser.add_argument('--path', action='append', dest='paths', help='Only render this path (repeatable)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        paths = options['paths'] or prerender.all_paths()
+        root = prerender.prerender_root()
+        root.mkdir(parents=True, exist_ok=True)
+
+        results = prerender.write_paths(paths, workers=options['workers'])
+        for path, status in results:
+            if status != 200:
+                self.stdout.write(self.style.WARNING(f'Skipped {path} (status {status})'))
+
+        if not options['paths']:
+            removed = prerender.prune(paths)
+            if removed:
+                self.stdout.write(f'Removed {removed} stale page(s)')
+
+        written = sum(1 for path, status in results if status == 200)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Pre-rendered {written} page(s) to {root} in {elapsed:.2f}s'))
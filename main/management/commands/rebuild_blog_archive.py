@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.archive import rebuild
+from main.search import bump_blog_content_version
+
+
+class Command(BaseCommand):
+    help = 'Recompute the blog archive index (post counts per category and month) from the posts'
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        # Cached archive navigation follows the blog content version
+        bump_blog_content_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the blog archive: {rows} category/month rows'))
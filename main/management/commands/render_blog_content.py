@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.content import highlight_css, render_content
+from main.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Backfill BlogPost.content_html (sanitised, highlighted HTML) for existing posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--css', action='store_true',
+                            help='Also regenerate the code highlighting stylesheet (static/css/highlight.css)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        updated = 0
+
+        for post in BlogPost.objects.only('pk', 'content', 'content_html').iterator(chunk_size=batch_size):
+            html = render_content(post.content)
+            if html == post.content_html:
+                continue
+            post.content_html = html
+            batch.append(post)
+            if len(batch) >= batch_size:
+                updated += BlogPost.objects.bulk_update(batch, ['content_html'])
+                batch = []
+        if batch:
+            updated += BlogPost.objects.bulk_update(batch, ['content_html'])
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered content for {updated} post(s)'))
+
+        if options['css']:
+            path = settings.BASE_DIR / 'templates' / 'static' / 'css' / 'highlight.css'
+            path.write_text(highlight_css())
+            self.stdout.write(self.style.SUCCESS(f'Wrote {path}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from main.analytics import log_dir, rollup
+
+
+class Command(BaseCommand):
+    help = 'Compact the page-view logs into the daily PageViewDaily counters (run from cron, e.g. every 15 minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Log directory (default: ANALYTICS_LOG_DIR)')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or log_dir()
+        hits, logs = rollup(directory)
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {hits} hits from {logs} logs in {directory}'))
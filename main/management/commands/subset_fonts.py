@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import fonts
+
+
+class Command(BaseCommand):
+    help = 'Subset the self-hosted web fonts to the characters the pages and posts use, and point fonts.css at the subsets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the characters in use')
+
+    def handle(self, *args, **options):
+        if fonts.subset is None and not options['dry_run']:
+            raise CommandError('fontTools is not installed (pip install fonttools brotli)')
+
+        css_path = fonts.fonts_css_path()
+        css = css_path.read_text(encoding='utf-8')
+        faces = fonts.font_faces(css)
+        codepoints = fonts.used_codepoints(fonts.page_text() + fonts.post_text())
+        self.stdout.write(f'{len(codepoints)} characters in use: {fonts.unicode_range(codepoints)}')
+        if options['dry_run']:
+            return
+
+        subsetted = set()
+        for descriptors, filename in faces:
+            source = css_path.parent / filename
+            if not source.exists():
+                self.stdout.write(self.style.WARNING(f'Skipped {filename} (not downloaded)'))
+                continue
+            target = css_path.parent / fonts.subset_name(filename)
+            fonts.subset_font(source, target, codepoints)
+            subsetted.add(filename)
+            self.stdout.write(f'{filename}: {source.stat().st_size} -> {target.stat().st_size} bytes')
+
+        css_path.write_text(fonts.rewrite_css(css, faces, codepoints, subsetted), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Subset {len(subsetted)} of {len(faces)} font(s); updated {css_path}'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main.throttle import get_rates, rejected_counts, reset_rejected_counts
+
+
+class Command(BaseCommand):
+    help = 'Show how many POSTs each throttled endpoint has rejected, to help tune THROTTLE_RATES'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        rates = get_rates()
+        counts = rejected_counts()
+        for endpoint, (limit, period) in sorted(rates.items()):
+            self.stdout.write(f'{endpoint}: {counts[endpoint]} rejected (limit {limit} per {period}s per IP)')
+        self.stdout.write(self.style.SUCCESS(f'Total rejected: {sum(counts.values())}'))
+
+        if options['reset']:
+            reset_rejected_counts()
+            self.stdout.write('Counters reset')
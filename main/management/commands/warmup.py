@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = 'Precompile templates, build the URL resolver, import lazy modules and prime caches (run before forking workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-caches', action='store_true', help="Don't prime the caches (no database queries)")
+
+    def handle(self, *args, **options):
+        timings = warm_up(caches=not options['skip_caches'])
+        for step, items, seconds in timings:
+            self.stdout.write(f'{step}: {items} in {seconds * 1000:.1f}ms')
+        total = sum(seconds for step, items, seconds in timings)
+        self.stdout.write(self.style.SUCCESS(f'Warm-up done in {total * 1000:.1f}ms'))
@@ -0,0 +1,468 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+
+from . import analytics, compression, preload, throttle
+from .models import BlogPost
+from .routers import get_replicas, use_replicas
+
+
+logger = logging.getLogger(__name__)
+
+
+# Public pages that are safe to serve from the full-page cache
+CACHED_PAGES = {
+    'home', 'about', 'our_mission', 'our_partners',
+    'blogs', 'blog_archive', 'blogpost', 'blogpost_detail',
+}
+
+PAGE_CACHE_VERSION_KEY = 'pagecache:version'
+
+# Public pages whose reads may be served by a read replica
+REPLICA_PAGES = CACHED_PAGES | {
+    'testimonials', 'testimonials_page', 'sitemap', 'sitemap_section',
+    'blog_feed', 'blog_atom_feed', 'blog_category_feed', 'blog_category_atom_feed',
+}
+
+# Cookie that pins a visitor to the primary after they wrote something
+REPLICA_PIN_COOKIE = 'ajif_primary'
+
+
+def get_page_cache_version():
+    """Current page cache generation - bumping it makes every cached page stale"""
+    version = cache.get(PAGE_CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(PAGE_CACHE_VERSION_KEY, 1, None)
+        version = cache.get(PAGE_CACHE_VERSION_KEY, 1)
+    return version
+
+
+def invalidate_page_cache():
+    """Make all cached pages stale at once (called when public content changes)"""
+    try:
+        cache.incr(PAGE_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(PAGE_CACHE_VERSION_KEY, 2, None)
+
+
+def page_cache_key(request):
+    """Cache key for a page - varies on host, path and the sorted query string"""
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    raw = f'{request.get_host()}{request.path}?{query}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'pagecache:{digest}'
+
+
+class PageCacheMiddleware:
+    """
+    Full-page cache for anonymous GET requests on the public pages.
+
+    Entries are kept for PAGE_CACHE_TIMEOUT seconds as fresh and then for
+    PAGE_CACHE_STALE_TIMEOUT more seconds as stale. An entry stored before
+    the last invalidate_page_cache() is stale too. Only one request (the one
+    that wins the rebuild lock) renders a stale page again; every other
+    request keeps getting the stale copy until the new one is stored. A page
+    that isn't cached at all is rendered once as well - the other requests
+    wait up to PAGE_CACHE_LOCK_WAIT seconds for it before rendering it
+    themselves.
+
+    Pages are stored minified along with their Brotli and gzip variants
+    (main.compression), so a page is compressed once per cache fill.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # Seconds between looks at the cache while another request renders a page
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+        self.stale_timeout = getattr(settings, 'PAGE_CACHE_STALE_TIMEOUT', 3600)
+        self.lock_timeout = getattr(settings, 'PAGE_CACHE_LOCK_TIMEOUT', 30)
+        self.lock_wait = getattr(settings, 'PAGE_CACHE_LOCK_WAIT', 2)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        key, locked, cached = self.lookup(request)
+        deadline = time.monotonic() + self.lock_wait
+        while key is not None and cached is None and not locked and time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            key, locked, cached = self.lookup(request)
+        if cached is not None:
+            return cached
+        if key is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+            self.update(request, key, response)
+        finally:
+            if locked:
+                self.release(key)
+        return response
+
+    async def __acall__(self, request):
+        key, locked, cached = await sync_to_async(self.lookup)(request)
+        deadline = time.monotonic() + self.lock_wait
+        while key is not None and cached is None and not locked and time.monotonic() < deadline:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            key, locked, cached = await sync_to_async(self.lookup)(request)
+        if cached is not None:
+            return cached
+        if key is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+            await sync_to_async(self.update)(request, key, response)
+        finally:
+            if locked:
+                await sync_to_async(self.release)(key)
+        return response
+
+    def lookup(self, request):
+        """
+        Return (key, locked, cached_response). key is None when the request
+        can't use the cache; cached_response is set when the cache answers
+        it; locked is True when this request took the lock to render the page.
+        Neither set means another request is rendering a page not yet cached.
+        """
+        if not self.is_cacheable_request(request):
+            return None, False, None
+
+        key = page_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and entry['fresh_until'] > time.time() and entry.get('version') == get_page_cache_version():
+            return key, False, self.build_response(request, entry, 'HIT')
+        # Stale or missing - only the request that takes the lock renders the page
+        if cache.add(f'{key}:lock', 1, self.lock_timeout):
+            return key, True, None
+        if entry is not None:
+            return key, False, self.build_response(request, entry, 'STALE')
+        return key, False, None
+
+    def update(self, request, key, response):
+        if self.is_cacheable_response(request, response):
+            entry = self.store(key, response)
+            self.set_content(request, response, entry)
+            response['X-Page-Cache'] = 'MISS'
+        else:
+            # Say the post was unpublished - don't keep serving the old copy as stale
+            cache.delete(key)
+
+    def release(self, key):
+        cache.delete(f'{key}:lock')
+
+    def is_cacheable_request(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        if match.url_name not in CACHED_PAGES:
+            return False
+        if request.user.is_authenticated:
+            return False
+        # Pending flash messages are rendered into the page - never share them
+        if len(get_messages(request)):
+            return False
+        return True
+
+    def is_cacheable_response(self, request, response):
+        if response.status_code != 200 or response.streaming:
+            return False
+        if response.cookies or response.has_header('Set-Cookie'):
+            return False
+        if 'private' in response.get('Cache-Control', '') or 'no-store' in response.get('Cache-Control', ''):
+            return False
+        # A CSRF token was rendered into the page
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            return False
+        if len(get_messages(request)):
+            return False
+        return True
+
+    def store(self, key, response):
+        content = compression.minified_content(response)
+        entry = {
+            'content': content,
+            'encoded': compression.encoded_variants(response, content),
+            'status': response.status_code,
+            'headers': list(response.items()),
+            'fresh_until': time.time() + self.timeout,
+            'version': get_page_cache_version(),
+        }
+        cache.set(key, entry, self.timeout + self.stale_timeout)
+        return entry
+
+    def build_response(self, request, entry, state):
+        response = HttpResponse(status=entry['status'])
+        for header, value in entry['headers']:
+            response[header] = value
+        self.set_content(request, response, entry)
+        response['X-Page-Cache'] = state
+        return response
+
+    def set_content(self, request, response, entry):
+        """Give the response the stored variant the browser accepts"""
+        encoded = entry.get('encoded', {})
+        encoding = compression.negotiate(request, encoded)
+        if encoded:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        compression.set_content(response, encoded[encoding] if encoding else entry['content'], encoding)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets main.routers.PrimaryReplicaRouter send reads from public pages to
+    the read replicas.
+
+    Anonymous GET/HEAD requests for REPLICA_PAGES read from a replica. After
+    a successful POST the visitor gets a short-lived cookie that keeps their
+    reads on the primary (read-your-writes) until the replicas have caught up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if self.reads_from_replica(request):
+            with use_replicas():
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        self.pin_after_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if await sync_to_async(self.reads_from_replica)(request):
+            with use_replicas():
+                return await self.get_response(request)
+
+        response = await self.get_response(request)
+        self.pin_after_write(request, response)
+        return response
+
+    def reads_from_replica(self, request):
+        if request.method not in ('GET', 'HEAD') or not get_replicas():
+            return False
+        if REPLICA_PIN_COOKIE in request.COOKIES:
+            return False
+        if request.user.is_authenticated:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in REPLICA_PAGES
+
+    def pin_after_write(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and get_replicas():
+            response.set_cookie(REPLICA_PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+
+
+class ThrottleMiddleware:
+    """
+    Rejects floods of anonymous POSTs to the endpoints in THROTTLE_RATES.
+
+    Sits in front of the CSRF and session middleware so a rejected request
+    costs a couple of cache lookups - its body (uploads included) is never
+    parsed, and no form is validated and nothing touches the database.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        rejected = self.check(request)
+        if rejected is not None:
+            return rejected
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        rejected = await sync_to_async(self.check)(request)
+        if rejected is not None:
+            return rejected
+        return await self.get_response(request)
+
+    def check(self, request):
+        """Return a 429 response when the request is over its limit"""
+        if request.method != 'POST':
+            return None
+        rates = throttle.get_rates()
+        try:
+            endpoint = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        if endpoint not in rates:
+            return None
+
+        limit, period = rates[endpoint]
+        ip = throttle.client_ip(request)
+        allowed, retry_after = throttle.hit(endpoint, ip, limit, period)
+        if allowed:
+            return None
+
+        throttle.record_rejection(endpoint)
+        logger.warning('Throttled POST to %s from %s', endpoint, ip)
+        response = HttpResponse(
+            'Too many requests - please wait a few minutes and try again.',
+            status=429, content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
+
+
+class PageViewMiddleware:
+    """
+    Counts page views and form submissions into main.analytics' buffered log.
+
+    Sits outside the page cache so cached pages are counted too. Recording
+    a hit is an in-memory append; the buffer reaches the disk in batches.
+    A blog post view also adds one to the post's view_count, with a single
+    UPDATE - the view itself doesn't run when the page comes from the cache.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        hit = analytics.hit_for(request, response)
+        if hit is not None:
+            if self.record(request, hit):
+                analytics.hit_log.flush()
+            if hit[0] == 'blogpost_detail':
+                self.viewed_posts(hit).update(view_count=F('view_count') + 1)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        hit = analytics.hit_for(request, response)
+        if hit is not None:
+            if self.record(request, hit):
+                await sync_to_async(analytics.hit_log.flush)()
+            if hit[0] == 'blogpost_detail':
+                await self.viewed_posts(hit).aupdate(view_count=F('view_count') + 1)
+        return response
+
+    def record(self, request, hit):
+        """Buffer the hit; True when the buffer should be written"""
+        route, obj = hit
+        return analytics.hit_log.record(route, obj, analytics.referrer_host(request))
+
+    def viewed_posts(self, hit):
+        return BlogPost.objects.filter(slug=hit[1], status='published')
+
+
+class CompressionMiddleware:
+    """
+    Minifies HTML and compresses responses with Brotli or gzip (main.compression).
+
+    Sits near the top so it sees the final body. Pages from the page cache
+    arrive already minified and compressed and are passed through.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        self.process(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.process(request, response)
+        return response
+
+    def process(self, request, response):
+        if response.has_header('X-Page-Cache'):
+            return
+        compression.compress_response(request, response)
+
+
+class PreloadMiddleware:
+    """
+    Adds a page's critical assets (main.preload) to its HTML responses as
+    a Link: rel=preload header, so fonts and hero images start downloading
+    alongside the HTML.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        self.add_links(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.add_links(request, response)
+        return response
+
+    def add_links(self, request, response):
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.has_header('Link'):
+            return
+        if not compression.is_html(response):
+            return
+        links = preload.links_for(preload.route_for(request.path_info))
+        if links:
+            response['Link'] = ', '.join(links)
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:32
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def normalize_emails(apps, schema_editor):
+    """Lower-case existing emails, keeping the oldest row of any case-variant duplicates"""
+    NewsletterSubscriber = apps.get_model('main', 'NewsletterSubscriber')
+    seen = set()
+    duplicates = []
+    changed = []
+    for subscriber in NewsletterSubscriber.objects.order_by('subscribed_at', 'pk').only('pk', 'email').iterator():
+        email = subscriber.email.strip().lower()
+        if email in seen:
+            duplicates.append(subscriber.pk)
+        elif email != subscriber.email:
+            subscriber.email = email
+            changed.append(subscriber)
+        seen.add(email)
+    NewsletterSubscriber.objects.filter(pk__in=duplicates).delete()
+    NewsletterSubscriber.objects.bulk_update(changed, ['email'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_blogpost_content_html'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='newslettersubscriber',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='newsletter_email_ci_unique'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_newslettersubscriber_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('route', models.CharField(help_text='URL name of the page', max_length=200)),
+                ('object_key', models.CharField(blank=True, help_text='Which post or category, for pages that show one', max_length=200)),
+                ('referrer_host', models.CharField(blank=True, max_length=200)),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily page views',
+                'verbose_name_plural': 'Daily page views',
+                'ordering': ['-date', '-views'],
+                'indexes': [models.Index(fields=['route', 'date'], name='main_pagevi_route_a79922_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pageviewdaily',
+            constraint=models.UniqueConstraint(fields=('date', 'route', 'object_key', 'referrer_host'), name='pageview_daily_unique'),
+        ),
+    ]
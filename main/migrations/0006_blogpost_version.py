@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_pageviewdaily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
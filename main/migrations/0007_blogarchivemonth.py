@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:51
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def build_archive(apps, schema_editor):
+    """Index the posts already published (main.archive keeps it up to date from here on)"""
+    BlogPost = apps.get_model('main', 'BlogPost')
+    BlogArchiveMonth = apps.get_model('main', 'BlogArchiveMonth')
+    months = {}
+    posts = BlogPost.objects.filter(status='published', published_date__isnull=False).order_by('published_date', 'pk')
+    for pk, category, published_date in posts.values_list('pk', 'category', 'published_date').iterator():
+        key = (category, timezone.localtime(published_date).date().replace(day=1))
+        if key in months:
+            months[key]['post_count'] += 1
+            months[key]['last_post_id'] = pk
+        else:
+            months[key] = {'post_count': 1, 'first_post_id': pk, 'last_post_id': pk}
+    BlogArchiveMonth.objects.bulk_create(
+        BlogArchiveMonth(category=category, month=month, **stats) for (category, month), stats in months.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_blogpost_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('news', 'News'), ('blog', 'Blog'), ('event', 'Event'), ('update', 'Update'), ('impact', 'Impact Story')], max_length=20)),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('first_post_id', models.PositiveBigIntegerField(help_text='Earliest published post of the month')),
+                ('last_post_id', models.PositiveBigIntegerField(help_text='Latest published post of the month')),
+            ],
+            options={
+                'ordering': ['-month', 'category'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'published_date'], name='blogpost_published_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='blogarchivemonth',
+            constraint=models.UniqueConstraint(fields=('category', 'month'), name='blog_archive_month_unique'),
+        ),
+        migrations.RunPython(build_archive, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:25
+
+from django.db import migrations, models
+import django.db.models.functions.text
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    # Rows written around save() since 0004 - case variants can't clash under newsletter_email_ci_unique
+    NewsletterSubscriber = apps.get_model('main', 'NewsletterSubscriber')
+    NewsletterSubscriber.objects.exclude(email=Lower('email')).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='newslettersubscriber',
+            constraint=models.CheckConstraint(check=models.Q(('email', django.db.models.functions.text.Lower('email'))), name='newsletter_email_lowercase'),
+        ),
+    ]
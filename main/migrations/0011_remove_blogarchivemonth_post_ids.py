@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_newslettersubscriber_email_lowercase'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='blogarchivemonth',
+            name='first_post_id',
+        ),
+        migrations.RemoveField(
+            model_name='blogarchivemonth',
+            name='last_post_id',
+        ),
+    ]
@@ -1,13 +1,88 @@
 from django.db import models
+from django.db.models.functions import Lower, Substr
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.utils import timezone
 
+from .content import render_content
+
+
+class ProjectionQuerySet(models.QuerySet):
+    """
+    QuerySet with named column sets, so each view loads only what it shows:
+
+        Partner.objects.filter(is_active=True).projection('card')
+    """
+    projections = {}
+
+    def projection(self, name):
+        return self.only(*self.projections[name])
+
+
+class PartnerQuerySet(ProjectionQuerySet):
+    projections = {
+        'card': ('id', 'name', 'logo', 'logo_width', 'logo_height', 'logo_placeholder', 'website', 'display_order'),
+        'choice': ('id', 'name', 'display_order'),
+        'detail': (
+            'id', 'name', 'logo', 'logo_width', 'logo_height', 'logo_placeholder', 'description', 'mission_statement', 'website', 'email', 'phone',
+            'facebook', 'twitter', 'instagram', 'youtube', 'featured_image',
+            'gallery_image_1', 'gallery_image_2', 'gallery_image_3', 'display_order',
+        ),
+    }
+
+
+class BlogPostQuerySet(ProjectionQuerySet):
+    projections = {
+        'card': (
+            'id', 'slug', 'title', 'excerpt', 'featured_image', 'featured_image_width', 'featured_image_height',
+            'featured_image_placeholder', 'category', 'created_at', 'published_date',
+        ),
+        # content is only needed when content_html hasn't been rendered yet
+        'detail': (
+            'id', 'slug', 'title', 'author', 'category', 'excerpt', 'content_html', 'featured_image',
+            'featured_image_width', 'featured_image_height', 'featured_image_placeholder',
+            'meta_title', 'meta_description', 'status', 'is_featured', 'published_date',
+            'created_at', 'updated_at', 'view_count',
+        ),
+    }
+    # The card columns (image measurements included, for {% lazy_image %}) - projection()
+    # adds a content_preview annotation
+    projections['listing'] = projections['card']
+
+    def projection(self, name):
+        queryset = super().projection(name)
+        if name == 'listing':
+            # Listings show a preview when there is no excerpt - cut it in the database
+            queryset = queryset.annotate(content_preview=Substr('content', 1, 150))
+        return queryset
+
+
+class TestimonialQuerySet(ProjectionQuerySet):
+    projections = {
+        'card': (
+            'id', 'name', 'organization', 'testimonial_type', 'content', 'image', 'image_width', 'image_height',
+            'image_placeholder', 'display_order', 'created_at',
+        ),
+    }
+
+
+class GalleryQuerySet(ProjectionQuerySet):
+    projections = {
+        'card': (
+            'id', 'title', 'description', 'image', 'image_width', 'image_height', 'image_placeholder',
+            'category', 'display_order', 'created_at',
+        ),
+    }
+
 
 class Partner(models.Model):
     """Partner organizations"""
     name = models.CharField(max_length=200)
     logo = models.ImageField(upload_to='partners/', null=True, blank=True)
+    # Measured at upload (main.images) so pages can size the image and show a preview
+    logo_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    logo_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    logo_placeholder = models.TextField(blank=True, editable=False, help_text="Tiny blurred logo shown while it loads")
     description = models.TextField()
     mission_statement = models.TextField(blank=True)
     website = models.URLField(blank=True)
@@ -32,6 +107,8 @@ class Partner(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PartnerQuerySet.as_manager()
+
     class Meta:
         ordering = ['display_order', 'name']
 
@@ -63,7 +140,12 @@ class BlogPost(models.Model):
     # Content
     excerpt = models.TextField(max_length=500, blank=True, help_text="Short description for previews")
     content = models.TextField()
+    content_html = models.TextField(blank=True, editable=False, help_text="Sanitised, highlighted HTML rendered from content on save")
     featured_image = models.ImageField(upload_to='blog/', null=True, blank=True)
+    # Measured at upload (main.images) so pages can size the image and show a preview
+    featured_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_placeholder = models.TextField(blank=True, editable=False, help_text="Tiny blurred featured image shown while it loads")
 
     # SEO
     meta_title = models.CharField(max_length=200, blank=True)
@@ -81,8 +163,17 @@ class BlogPost(models.Model):
     # Statistics
     view_count = models.IntegerField(default=0)
 
+    # Bumped on every edit - autosave only writes over the version the editor loaded
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = BlogPostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-published_date', '-created_at']
+        indexes = [
+            # Monthly archive pages are a range scan over this
+            models.Index(fields=['status', 'published_date'], name='blogpost_published_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -92,12 +183,37 @@ class BlogPost(models.Model):
             self.slug = slugify(self.title)
         if self.status == 'published' and not self.published_date:
             self.published_date = timezone.now()
+        update_fields = kwargs.get('update_fields')
+        # A full save is an edit; autosave claims its version with an UPDATE before saving fields
+        if update_fields is None and not self._state.adding:
+            self.version += 1
+        # Render the content once here instead of on every page view
+        if update_fields is None or 'content' in update_fields:
+            self.content_html = render_content(self.content)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html'}
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return f'/blogpost/{self.slug}/'
 
 
+class BlogArchiveMonth(models.Model):
+    """Published posts per category and month - kept up to date by main.archive"""
+    category = models.CharField(max_length=20, choices=BlogPost.CATEGORY_CHOICES)
+    month = models.DateField(help_text="First day of the month")
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-month', 'category']
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'month'], name='blog_archive_month_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_category_display()} {self.month:%B %Y}: {self.post_count}"
+
+
 class Testimonial(models.Model):
     """Testimonials from community members, partners, donors"""
     TESTIMONIAL_TYPE_CHOICES = [
@@ -112,6 +228,10 @@ class Testimonial(models.Model):
     testimonial_type = models.CharField(max_length=20, choices=TESTIMONIAL_TYPE_CHOICES, default='personal')
     content = models.TextField()
     image = models.ImageField(upload_to='testimonials/', null=True, blank=True)
+    # Measured at upload (main.images) so pages can size the image and show a preview
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False, help_text="Tiny blurred photo shown while it loads")
 
     # Status
     is_approved = models.BooleanField(default=False)
@@ -122,6 +242,8 @@ class Testimonial(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TestimonialQuerySet.as_manager()
+
     class Meta:
         ordering = ['display_order', '-created_at']
 
@@ -222,6 +344,11 @@ class Donation(models.Model):
         super().save(*args, **kwargs)
 
 
+def normalize_email(email):
+    """Subscriber emails are compared case-insensitively - store them lower-cased"""
+    return (email or '').strip().lower()
+
+
 class NewsletterSubscriber(models.Model):
     """Newsletter email subscriptions"""
     email = models.EmailField(unique=True)
@@ -232,10 +359,24 @@ class NewsletterSubscriber(models.Model):
 
     class Meta:
         ordering = ['-subscribed_at']
+        constraints = [
+            # A@x.com and a@x.com are the same subscriber
+            models.UniqueConstraint(Lower('email'), name='newsletter_email_ci_unique'),
+            # Stored lower-cased, so ON CONFLICT (email) in import_subscribers sees every duplicate
+            models.CheckConstraint(check=models.Q(email=Lower('email')), name='newsletter_email_lowercase'),
+        ]
 
     def __str__(self):
         return self.email
 
+    def clean(self):
+        # Before validate_constraints() checks newsletter_email_lowercase (admin and model forms)
+        self.email = normalize_email(self.email)
+
+    def save(self, *args, **kwargs):
+        self.email = normalize_email(self.email)
+        super().save(*args, **kwargs)
+
 
 class Gallery(models.Model):
     """Image gallery for events and activities"""
@@ -250,6 +391,10 @@ class Gallery(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='gallery/')
+    # Measured at upload (main.images) so pages can size the image and show a preview
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False, help_text="Tiny blurred image shown while it loads")
     category = models.CharField(max_length=20, choices=GALLERY_CATEGORY_CHOICES, default='event')
 
     # Related content
@@ -263,6 +408,8 @@ class Gallery(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = GalleryQuerySet.as_manager()
+
     class Meta:
         ordering = ['display_order', '-created_at']
         verbose_name_plural = "Galleries"
@@ -314,3 +461,40 @@ class SiteSettings(models.Model):
     def get_settings(cls):
         obj, created = cls.objects.get_or_create(pk=1)
         return obj
+
+
+class MediaBlob(models.Model):
+    """Reference count for a content-addressed media file (see main.storage)"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class PageViewDaily(models.Model):
+    """Views of one page per day, compacted from the hit log by rollup_pageviews"""
+    date = models.DateField()
+    route = models.CharField(max_length=200, help_text="URL name of the page")
+    object_key = models.CharField(max_length=200, blank=True, help_text="Which post or category, for pages that show one")
+    referrer_host = models.CharField(max_length=200, blank=True)
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date', '-views']
+        verbose_name = "Daily page views"
+        verbose_name_plural = "Daily page views"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'route', 'object_key', 'referrer_host'], name='pageview_daily_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['route', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.route} {self.object_key} on {self.date}: {self.views}"
@@ -0,0 +1,107 @@
+"""
+Preload hints for the assets each page needs before it can paint.
+
+CRITICAL_ASSETS lists, per URL name, the fonts, stylesheets and hero images
+a page needs. main.middleware.PreloadMiddleware sends them as a
+`Link: rel=preload` header, so the browser (or a CDN that turns Link headers
+into 103 Early Hints) fetches them while the HTML is still downloading.
+Under ASGI, EarlyHints - wrapped around the application in asgi.py - also
+sends a 103 Early Hints response before the view runs, when the server
+supports the http.response.early_hint extension.
+"""
+import functools
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.urls import Resolver404, resolve
+
+
+# Static path -> (as, type) for every page
+COMMON_ASSETS = [
+    ('css/output.css', 'style', ''),
+    ('assets/fonts/fonts.css', 'style', ''),
+    ('assets/fonts/archivo-black.woff2', 'font', 'font/woff2'),
+    ('assets/fonts/quattrocento-regular.woff2', 'font', 'font/woff2'),
+    ('assets/logo.png', 'image', ''),
+]
+
+# URL name -> the above-the-fold images of that page
+CRITICAL_ASSETS = {
+    'home': [('assets/bg.png', 'image', ''), ('assets/mission-preview.jpg', 'image', '')],
+    'our_mission': [('assets/CTA.png', 'image', '')],
+    'about': [('assets/CTA.png', 'image', '')],
+    'our_partners': [('assets/CTA.png', 'image', '')],
+    'testimonials': [('assets/bg.png', 'image', '')],
+    'blogs': [],
+    'blog_archive': [],
+    'blogpost': [],
+    'blogpost_detail': [],
+    'contact': [],
+    'donate': [],
+}
+
+
+def get_manifest():
+    """{url name: [(static path, as, type)]} from settings.CRITICAL_ASSETS"""
+    return getattr(settings, 'CRITICAL_ASSETS', CRITICAL_ASSETS)
+
+
+def link(path, as_, type_=''):
+    value = f'<{staticfiles_storage.url(path)}>; rel=preload; as={as_}'
+    if type_:
+        value += f'; type="{type_}"'
+    if as_ == 'font':
+        # Fonts are always fetched in CORS mode; without this the preload is wasted
+        value += '; crossorigin'
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def links_for(route):
+    """Link header values for a page - only for assets that exist, computed once per process"""
+    manifest = get_manifest()
+    if route not in manifest:
+        return ()
+    links = []
+    for path, as_, type_ in COMMON_ASSETS + list(manifest[route]):
+        subset = path.replace('.woff2', '.subset.woff2')
+        if as_ == 'font' and finders.find(subset):
+            # Built by `manage.py subset_fonts` and covering the site's text
+            path = subset
+        if finders.find(path):
+            links.append(link(path, as_, type_))
+    return tuple(links)
+
+
+def route_for(path):
+    """URL name of a path, or None"""
+    try:
+        return resolve(path).url_name
+    except Resolver404:
+        return None
+
+
+class EarlyHints:
+    """
+    ASGI wrapper that sends 103 Early Hints with a page's preload links.
+
+    The hints go out as soon as the request arrives, before the view
+    queries and renders anything; servers without the early hint extension
+    just get the Link header on the final response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] == 'http'
+            and scope['method'] in ('GET', 'HEAD')
+            and 'http.response.early_hint' in scope.get('extensions', {})
+            and getattr(settings, 'PRELOAD_EARLY_HINTS', True)
+        ):
+            links = links_for(route_for(scope['path'][len(scope.get('root_path', '')):] or '/'))
+            if links:
+                await send({'type': 'http.response.early_hint', 'links': [value.encode('latin-1') for value in links]})
+        await self.app(scope, receive, send)
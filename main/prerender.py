@@ -0,0 +1,151 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from .models import BlogPost
+
+
+logger = logging.getLogger(__name__)
+
+# Pages written out as static HTML for nginx to serve to anonymous visitors:
+#
+#     location / {
+#         if ($cookie_sessionid) { proxy_pass http://django; }
+#         try_files /prerendered$uri/index.html @django;
+#     }
+STATIC_PAGES = ['home', 'about', 'our_mission', 'our_partners', 'testimonials', 'blogs', 'blogpost']
+
+
+def prerender_root():
+    return Path(getattr(settings, 'PRERENDER_ROOT', settings.BASE_DIR / 'prerendered'))
+
+
+def output_file(path):
+    """'/blogpost/some-slug/' -> <PRERENDER_ROOT>/blogpost/some-slug/index.html"""
+    return prerender_root().joinpath(*path.strip('/').split('/'), 'index.html')
+
+
+def all_paths():
+    """Every public path that gets pre-rendered"""
+    paths = [reverse(name) for name in STATIC_PAGES]
+    for slug in BlogPost.objects.filter(status='published').values_list('slug', flat=True):
+        paths.append(reverse('blogpost_detail', args=[slug]))
+    return paths
+
+
+def render_path(path):
+    """Render one public page the way an anonymous visitor sees it"""
+    request = RequestFactory().get(path, HTTP_HOST=getattr(settings, 'PRERENDER_HOST', 'localhost'))
+    request.user = AnonymousUser()
+    match = resolve(path)
+    view = match.func
+    if iscoroutinefunction(view):
+        # ASYNC_PUBLIC_VIEWS routes the public pages to main.async_views
+        view = async_to_sync(view)
+    try:
+        response = view(request, *match.args, **match.kwargs)
+    except Http404:
+        # Unpublished since the path was listed - not a failure, the file just goes
+        return 404, b''
+    if hasattr(response, 'render'):
+        response = response.render()
+    return response.status_code, response.content
+
+
+def write_path(path):
+    """Render a page and atomically replace its file; returns (path, status)"""
+    try:
+        status, content = render_path(path)
+    except Exception:
+        # A broken page must not break the save that triggered the rebuild
+        logger.exception('Pre-rendering %s failed', path)
+        status = 500
+    target = output_file(path)
+    if status != 200:
+        remove_path(path)
+        return path, status
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=target.parent, delete=False) as tmp:
+        tmp.write(content)
+    os.replace(tmp.name, target)
+    return path, status
+
+
+def remove_path(path):
+    target = output_file(path)
+    if target.exists():
+        target.unlink()
+
+
+def _setup_worker():
+    django.setup()
+
+
+def write_paths(paths, workers=None):
+    """Render many pages in a process pool"""
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        return list(pool.map(write_path, paths, chunksize=4))
+
+
+def affected_paths(instance, deleted=False):
+    """
+    Pages affected by saving or deleting instance, as (to_render, to_remove)
+    """
+    if isinstance(instance, BlogPost):
+        render = [reverse('home'), reverse('blogs'), reverse('blogpost')]
+        remove = []
+        if instance.slug:
+            post_path = reverse('blogpost_detail', args=[instance.slug])
+            if deleted or instance.status != 'published':
+                remove.append(post_path)
+            else:
+                render.append(post_path)
+            # Posts in the same category show the first three others as related,
+            # so they only change when this post is (or was) near the top
+            in_category = BlogPost.objects.filter(status='published', category=instance.category)
+            if remove or instance.pk in list(in_category.values_list('pk', flat=True)[:4]):
+                render += [
+                    reverse('blogpost_detail', args=[slug])
+                    for slug in in_category.exclude(pk=instance.pk).values_list('slug', flat=True)
+                ]
+        return render, remove
+    model = instance._meta.model_name
+    if model == 'partner':
+        return [reverse('home'), reverse('about'), reverse('our_partners')], []
+    if model == 'testimonial':
+        return [reverse('home'), reverse('our_mission'), reverse('testimonials')], []
+    if model == 'gallery':
+        return [reverse('about'), reverse('our_mission')], []
+    return [], []
+
+
+def refresh_paths(render, remove):
+    """Incremental rebuild after a save - runs in-process, only a few pages"""
+    for path in remove:
+        remove_path(path)
+    for path in dict.fromkeys(render):
+        write_path(path)
+
+
+def prune(keep):
+    """Delete pre-rendered files for pages that no longer exist"""
+    keep = {output_file(path) for path in keep}
+    removed = 0
+    for target in prerender_root().rglob('index.html'):
+        if target not in keep:
+            target.unlink()
+            removed += 1
+    return removed
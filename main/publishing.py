@@ -0,0 +1,67 @@
+"""
+Publish, unpublish and feature blog posts in bulk.
+
+Each change is one UPDATE over the selected posts - no per-row save() - plus
+a refresh of the archive months they count towards, followed by one
+invalidation for everything that shows posts: the page cache (which also
+versions the sitemaps and feeds), the cached searches and autocomplete
+index, and the pre-rendered static pages.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Now
+
+from . import archive, prerender
+from .db import immediate_atomic
+from .middleware import invalidate_page_cache
+from .models import BlogPost
+from .search import bump_blog_content_version
+
+
+def apply(queryset, exclude, refresh_archive=False, **changes):
+    """
+    UPDATE the posts in queryset that aren't already in the target state
+    (`exclude` filters those out) and return their IDs.
+    """
+    with immediate_atomic():
+        ids = list(queryset.exclude(**exclude).order_by().values_list('pk', flat=True))
+        if ids:
+            # Editors with the post open get a conflict instead of overwriting the change
+            BlogPost.objects.filter(pk__in=ids).update(version=F('version') + 1, updated_at=Now(), **changes)
+            if refresh_archive:
+                archive.refresh_posts(ids)
+            transaction.on_commit(lambda: posts_changed(ids))
+    return ids
+
+
+def publish(queryset):
+    """Publish posts, keeping the published date of any that were published before"""
+    return apply(
+        queryset, {'status': 'published'}, refresh_archive=True,
+        status='published', published_date=Coalesce('published_date', Now()),
+    )
+
+
+def unpublish(queryset):
+    """Move posts back to draft"""
+    return apply(queryset, {'status': 'draft'}, refresh_archive=True, status='draft')
+
+
+def set_featured(queryset, featured=True):
+    return apply(queryset, {'is_featured': featured}, is_featured=featured)
+
+
+def posts_changed(ids):
+    """One round of invalidation for a batch of changed posts"""
+    invalidate_page_cache()
+    # The search cache and every process's autocomplete index follow this version
+    bump_blog_content_version()
+
+    if getattr(settings, 'PRERENDER_ON_SAVE', False) and prerender.prerender_root().exists():
+        render, remove = [], []
+        for post in BlogPost.objects.filter(pk__in=ids).only('pk', 'slug', 'status', 'category'):
+            post_render, post_remove = prerender.affected_paths(post)
+            render += post_render
+            remove += post_remove
+        prerender.refresh_paths(render, remove)
@@ -0,0 +1,128 @@
+"""
+Per-view query budgets.
+
+Views declare how many database queries one request may take:
+
+    @query_budget(4)
+    def home(request):
+        ...
+
+Every query run while the view (and its template) executes is counted, in
+the request's own context, so async views and the threads they hand ORM work
+to are covered too. Over budget, the request logs a structured warning with
+the fingerprints of the queries it ran. With QUERY_BUDGET_RAISE (as the
+generated tests in main/test_query_budgets.py set it) it raises
+QueryBudgetExceeded instead, so an N+1 slipped into a template fails CI.
+"""
+import json
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_tracker = ContextVar('query_budget_tracker', default=None)
+
+PLACEHOLDER_RE = re.compile(r"%s|'(?:[^']|'')*'|\b\d+\b")
+IN_LIST_RE = re.compile(r'\(\?(?:,\s*\?)+\)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """SQL with literals and parameters replaced, so the same query from different rows matches"""
+    sql = PLACEHOLDER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('(...)', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class QueryTracker:
+    def __init__(self):
+        self.count = 0
+        self.fingerprints = Counter()
+
+    def record(self, sql):
+        self.count += 1
+        self.fingerprints[fingerprint(sql)] += 1
+
+
+def count_queries(execute, sql, params, many, context):
+    """Connection execute wrapper - counts queries for the current request's tracker, if any"""
+    tracker = _tracker.get()
+    if tracker is not None:
+        tracker.record(sql)
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver - adds count_queries to every database connection"""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def check_budget(view_name, request, budget, tracker):
+    if tracker.count <= budget:
+        return
+    report = {
+        'view': view_name,
+        'path': request.path,
+        'method': request.method,
+        'budget': budget,
+        'queries': tracker.count,
+        'fingerprints': [
+            {'sql': sql, 'count': count} for sql, count in tracker.fingerprints.most_common(10)
+        ],
+    }
+    if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+        raise QueryBudgetExceeded(
+            f'{view_name} ran {tracker.count} queries (budget {budget}):\n'
+            + '\n'.join(f'  {item["count"]}x {item["sql"]}' for item in report['fingerprints'])
+        )
+    logger.warning('Query budget exceeded: %s', json.dumps(report), extra={'query_budget': report})
+
+
+def query_budget(max_queries):
+    """Declare the most queries one request to the decorated view may run"""
+    def decorator(view):
+        view_name = f'{view.__module__}.{view.__qualname__}'
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                # A view called from another budgeted view counts towards the outer budget
+                if _tracker.get() is not None:
+                    return await view(request, *args, **kwargs)
+                tracker = QueryTracker()
+                token = _tracker.set(tracker)
+                try:
+                    response = await view(request, *args, **kwargs)
+                finally:
+                    _tracker.reset(token)
+                check_budget(view_name, request, max_queries, tracker)
+                return response
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if _tracker.get() is not None:
+                    return view(request, *args, **kwargs)
+                tracker = QueryTracker()
+                token = _tracker.set(tracker)
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    _tracker.reset(token)
+                check_budget(view_name, request, max_queries, tracker)
+                return response
+
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
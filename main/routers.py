@@ -0,0 +1,55 @@
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+
+
+# Per-request routing state, set by main.middleware.ReplicaRoutingMiddleware
+_state = Local()
+
+
+def get_replicas():
+    """Database aliases that can serve read-only traffic"""
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in settings.DATABASES]
+
+
+@contextmanager
+def use_replicas():
+    """Route reads inside the block to one randomly picked replica"""
+    previous = getattr(_state, 'replica', None)
+    replicas = get_replicas()
+    _state.replica = random.choice(replicas) if replicas else None
+    try:
+        yield _state.replica
+    finally:
+        _state.replica = previous
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads from public pages to a replica and everything else
+    (writes, admin, logged-in users, management commands) to the primary.
+
+    Reads only go to a replica inside use_replicas(), which the routing
+    middleware enters for anonymous safe requests to the public pages.
+    """
+
+    def db_for_read(self, model, **hints):
+        # The database cache's versions and locks must never be read from a lagging copy
+        if model._meta.app_label == 'django_cache':
+            return 'default'
+        return getattr(_state, 'replica', None) or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {'default', *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,92 @@
+"""
+Blog search with a result cache.
+
+A search is cached as the ordered IDs of the posts it found, keyed by the
+normalised query and category, so "Flood Relief", "flood  relief" and
+"FLOOD RELIEF" share one entry. Keys include the blog content version, which
+every post save or delete bumps, so all cached results go stale at once and
+the old entries simply expire. A repeated search costs one primary-key IN
+lookup for the posts it shows.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import BlogPost
+
+
+BLOG_CONTENT_VERSION_KEY = 'blogposts:version'
+
+# Posts shown per section of the blog page
+SEARCH_PAGE_SIZE = 10
+
+
+def get_blog_content_version():
+    """Current generation of the published blog content"""
+    version = cache.get(BLOG_CONTENT_VERSION_KEY)
+    if version is None:
+        cache.add(BLOG_CONTENT_VERSION_KEY, 1, None)
+        version = cache.get(BLOG_CONTENT_VERSION_KEY, 1)
+    return version
+
+
+def bump_blog_content_version():
+    """Expire every cached search at once (called when a post changes)"""
+    try:
+        cache.incr(BLOG_CONTENT_VERSION_KEY)
+    except ValueError:
+        cache.set(BLOG_CONTENT_VERSION_KEY, 2, None)
+
+
+def normalize_query(value):
+    """Case-folded with runs of whitespace collapsed"""
+    return ' '.join((value or '').casefold().split())
+
+
+def search_published_posts(query, category):
+    """Published posts matching the blog search box and category filter"""
+    db_posts = BlogPost.objects.filter(status='published')
+
+    # Apply search filter
+    if query:
+        db_posts = db_posts.filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(excerpt__icontains=query)
+        )
+
+    # Apply category filter
+    if category:
+        db_posts = db_posts.filter(category=category)
+    return db_posts
+
+
+def search_result_ids(query, category):
+    """(blog post IDs, news post IDs) for a search, in listing order"""
+    query, category = normalize_query(query), normalize_query(category)
+    digest = hashlib.md5(f'{query}\0{category}'.encode('utf-8')).hexdigest()
+    key = f'search:{get_blog_content_version()}:{digest}'
+    ids = cache.get(key)
+    if ids is None:
+        posts = search_published_posts(query, category)
+        ids = (
+            list(posts.exclude(category='news').values_list('pk', flat=True)[:SEARCH_PAGE_SIZE]),  # Blog, impact, update, event
+            list(posts.filter(category='news').values_list('pk', flat=True)[:SEARCH_PAGE_SIZE]),  # News only
+        )
+        cache.set(key, ids, getattr(settings, 'SEARCH_CACHE_TIMEOUT', 3600))
+    return ids
+
+
+def search_results(query, category):
+    """(blog posts, news posts) for the blog page - one IN lookup when the search is cached"""
+    blog_ids, news_ids = search_result_ids(query, category)
+    if not blog_ids and not news_ids:
+        return [], []
+    posts = BlogPost.objects.projection('listing').in_bulk(blog_ids + news_ids)
+    # Skip a post deleted between caching the IDs and this lookup
+    return (
+        [posts[pk] for pk in blog_ids if pk in posts],
+        [posts[pk] for pk in news_ids if pk in posts],
+    )
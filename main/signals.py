@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import archive, autocomplete, images, prerender
+from .middleware import invalidate_page_cache
+from .models import BlogPost, Gallery, Partner, SiteSettings, Testimonial
+from .search import bump_blog_content_version
+from .storage import ContentAddressedStorage, is_content_addressed
+
+
+# Models whose rows are rendered on the cached public pages
+PUBLIC_CONTENT_MODELS = (BlogPost, Partner, Testimonial, Gallery, SiteSettings)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def public_content_changed(sender, instance, **kwargs):
+    """Drop cached pages and re-render static copies when public content changes"""
+    if sender not in PUBLIC_CONTENT_MODELS:
+        return
+    # View count bumps don't change anything a cached page shows
+    if kwargs.get('update_fields') == frozenset(['view_count']):
+        return
+    if sender is BlogPost and not is_public_post_change(instance, **kwargs):
+        return
+    refresh_public_content(instance, deleted=kwargs.get('signal') is post_delete)
+
+
+def refresh_public_content(instance, deleted=False):
+    """Drop cached pages and re-render the static copies that show instance"""
+    # After the commit - before it, a request could cache the page again from the old rows
+    transaction.on_commit(invalidate_page_cache)
+
+    # Only keep the static site up to date once prerender_site has built it
+    if getattr(settings, 'PRERENDER_ON_SAVE', False) and prerender.prerender_root().exists():
+        render, remove = prerender.affected_paths(instance, deleted=deleted)
+        transaction.on_commit(lambda: prerender.refresh_paths(render, remove))
+
+
+@receiver(pre_save, sender=BlogPost)
+def remember_previous_post(sender, instance, update_fields=None, **kwargs):
+    """Note whether the post was published, and the archive month it counted towards, before this save"""
+    if kwargs.get('raw'):
+        return
+    if instance.pk is None:
+        instance._was_published = False
+        return
+    if update_fields is not None and not archive.ARCHIVE_FIELDS & set(update_fields):
+        # Neither its status nor its archive month is being written
+        instance._was_published = instance.status == 'published'
+        return
+    row = sender._default_manager.filter(pk=instance.pk).values_list('status', 'category', 'published_date').first()
+    instance._was_published = row is not None and row[0] == 'published'
+    instance._previous_archive_key = archive.archive_key(*row[1:]) if row else None
+
+
+def is_public_post_change(instance, **kwargs):
+    """Whether saving or deleting a post changes the public site - a draft that stays a draft doesn't"""
+    if instance.status == 'published':
+        return True
+    if kwargs.get('signal') is post_delete:
+        return False
+    # Saved without the pre_save above (a raw fixture load) - assume it was
+    return getattr(instance, '_was_published', True)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def blog_content_changed(sender, instance, **kwargs):
+    """Update the archive index, expire the cached searches and keep this process's autocomplete index in step"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields == frozenset(['view_count']):
+        return
+    # Draft autosaves run every few seconds - they must not expire the whole site
+    if not is_public_post_change(instance, **kwargs):
+        instance.__dict__.pop('_previous_archive_key', None)
+        return
+    if update_fields is None or archive.ARCHIVE_FIELDS & update_fields:
+        previous = instance.__dict__.pop('_previous_archive_key', None)
+        archive.refresh([previous, archive.archive_key(instance.category, instance.published_date)])
+    transaction.on_commit(bump_blog_content_version)
+    deleted = kwargs.get('signal') is post_delete
+    transaction.on_commit(lambda: autocomplete.post_changed(instance, deleted=deleted))
+
+
+def content_addressed_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+@receiver(pre_save)
+def measure_uploaded_images(sender, instance, update_fields=None, **kwargs):
+    """Record the size and placeholder of newly uploaded images (main.images)"""
+    if kwargs.get('raw'):
+        return
+    for field in images.measured_fields(sender):
+        if update_fields is None or field.name in update_fields:
+            images.measure_field(instance, field)
+
+
+@receiver(pre_save)
+def remember_media_files(sender, instance, update_fields=None, **kwargs):
+    """Note the current file names so replaced files can be released after saving"""
+    fields = content_addressed_fields(sender)
+    if not fields or instance.pk is None or kwargs.get('raw'):
+        return
+    if update_fields is not None:
+        fields = [f for f in fields if f.name in update_fields]
+        if not fields:
+            return
+    instance._previous_media = (
+        sender._default_manager.filter(pk=instance.pk).values(*[f.attname for f in fields]).first() or {}
+    )
+
+
+@receiver(post_save)
+def release_replaced_media(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_media', None)
+    if not previous:
+        return
+    del instance._previous_media
+    for field in content_addressed_fields(sender):
+        old_name = previous.get(field.attname)
+        current = getattr(instance, field.attname)
+        if is_content_addressed(old_name) and old_name != (current.name if current else None):
+            field.storage.delete(old_name)
+
+
+@receiver(post_delete)
+def release_deleted_media(sender, instance, **kwargs):
+    """Drop the references a deleted row held on content-addressed files"""
+    for field in content_addressed_fields(sender):
+        file = getattr(instance, field.attname)
+        if file and is_content_addressed(file.name):
+            field.storage.delete(file.name)
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+
+
+CAS_PREFIX = 'cas/'
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Media storage that names files by the SHA-256 of their bytes.
+
+    Uploading the same photo twice (as a partner image, a gallery image and a
+    blog featured image, say) stores it once under
+    cas/<aa>/<bb>/<sha256><ext>. Every save adds a reference in MediaBlob and
+    delete() only removes the file when the last reference goes away.
+
+    Because a name can never point at different bytes, the web server can
+    serve these files as immutable:
+
+        location /media/cas/ {
+            add_header Cache-Control "public, max-age=31536000, immutable";
+        }
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen from the content in _save
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        tmp_dir = self.path(f'{CAS_PREFIX}tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        # Hash while copying to a temp file so the upload is read only once
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+
+            sha = digest.hexdigest()
+            final_name = f'{CAS_PREFIX}{sha[:2]}/{sha[2:4]}/{sha}{ext}'
+            full_path = self.path(final_name)
+            if os.path.exists(full_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.add_reference(final_name, size)
+        return final_name
+
+    def add_reference(self, name, size=0):
+        from .models import MediaBlob
+
+        MediaBlob.objects.bulk_create([MediaBlob(name=name, size=size)], ignore_conflicts=True)
+        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+    def delete(self, name):
+        """Drop one reference; the file itself goes when nothing uses it any more"""
+        if not is_content_addressed(name):
+            return super().delete(name)
+
+        from .models import MediaBlob
+
+        MediaBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        deleted, _ = MediaBlob.objects.filter(name=name, ref_count=0).delete()
+        if deleted:
+            super().delete(name)
+
@@ -0,0 +1,112 @@
+import csv
+import io
+import logging
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from .db import immediate_atomic
+from .models import NewsletterSubscriber, normalize_email
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def subscribe(email, name=''):
+    """
+    Subscribe an address (or re-activate it). Returns True for a new or
+    re-activated subscription, False when it was already active.
+    """
+    with immediate_atomic():
+        subscriber, created = NewsletterSubscriber.objects.get_or_create(
+            email=normalize_email(email), defaults={'name': name},
+        )
+        if created:
+            return True
+        if not subscriber.is_active:
+            NewsletterSubscriber.objects.filter(pk=subscriber.pk).update(is_active=True, unsubscribed_at=None)
+            return True
+    return False
+
+
+def read_csv(fileobj):
+    """
+    Yield (email, name) from a CSV of subscribers, one row at a time.
+
+    With a header row the 'email' and 'name' columns are used (in any order);
+    without one the first column is the email and the second the name.
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(fileobj)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column.strip().lower() for column in header]
+    if 'email' in columns:
+        email_index = columns.index('email')
+        name_index = columns.index('name') if 'name' in columns else None
+    else:
+        email_index, name_index = 0, 1
+        yield header[0], header[1] if len(header) > 1 else ''
+    for row in reader:
+        if len(row) <= email_index:
+            continue
+        name = row[name_index] if name_index is not None and len(row) > name_index else ''
+        yield row[email_index], name
+
+
+def import_subscribers(rows, update_names=False, batch_size=BATCH_SIZE):
+    """
+    Insert (email, name) rows in batches, skipping invalid and duplicate addresses.
+
+    Emails are normalised before insertion, so existing subscribers are
+    caught by the unique index in the same INSERT - either left alone
+    (ignore_conflicts) or, with update_names, have their name updated
+    (update_conflicts). Nothing is looked up row by row, so the cost is one
+    statement per batch however many addresses already exist.
+
+    Returns a dict of counts: created, existing, invalid, duplicates.
+    """
+    seen = set()
+    stats = {'created': 0, 'existing': 0, 'invalid': 0, 'duplicates': 0}
+    total = NewsletterSubscriber.objects.count()
+    batch = []
+
+    def flush():
+        if update_names:
+            NewsletterSubscriber.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=['email'], update_fields=['name'],
+            )
+        else:
+            NewsletterSubscriber.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+
+    processed = 0
+    for email, name in rows:
+        email = normalize_email(email)
+        try:
+            validate_email(email)
+        except ValidationError:
+            stats['invalid'] += 1
+            continue
+        if email in seen:
+            # The same address twice in one INSERT ... ON CONFLICT is an error on PostgreSQL
+            stats['duplicates'] += 1
+            continue
+        seen.add(email)
+        name = (name or '').strip()[:NewsletterSubscriber._meta.get_field('name').max_length]
+        batch.append(NewsletterSubscriber(email=email, name=name))
+        processed += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    stats['created'] = NewsletterSubscriber.objects.count() - total
+    stats['existing'] = processed - stats['created']
+    logger.info('Subscriber import: %(created)d created, %(existing)d existing, '
+                '%(invalid)d invalid, %(duplicates)d duplicates', stats)
+    return stats
@@ -0,0 +1,41 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from main.images import measured_fields
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def lazy_image(file, alt='', css_class='', eager=False):
+    """
+    <img> for an uploaded image with its stored width and height and the
+    blurred placeholder as background until it loads - nothing is decoded
+    here:
+
+        {% lazy_image post.featured_image alt=post.title css_class="w-full h-full object-cover" %}
+
+    Pass eager=True for the image at the top of a page.
+    """
+    if not file:
+        return ''
+    instance, field = file.instance, file.field
+    attrs = {'src': file.url, 'alt': alt, 'class': css_class}
+    if field in measured_fields(type(instance)):
+        attrs['width'] = getattr(instance, f'{field.name}_width')
+        attrs['height'] = getattr(instance, f'{field.name}_height')
+        data_uri = getattr(instance, f'{field.name}_placeholder')
+        if data_uri:
+            attrs['style'] = f'background:url({data_uri}) center/cover no-repeat'
+            # Transparent images (logos) must not keep the preview behind them
+            attrs['onload'] = "this.style.background=''"
+    if eager:
+        attrs['fetchpriority'] = 'high'
+    else:
+        attrs['loading'] = 'lazy'
+    attrs['decoding'] = 'async'
+    # alt stays even when empty - that marks the image as decorative
+    attrs = {name: value for name, value in attrs.items() if name == 'alt' or value not in (None, '')}
+    return format_html('<img{}>', flatatt(attrs))
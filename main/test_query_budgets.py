@@ -0,0 +1,112 @@
+"""
+Query budget tests, generated from main.urls - one test per route.
+
+Each route is requested with enough rows in every table that a per-row query
+(an N+1 in a view or template) pushes it over the budget its view declares
+with @query_budget. New routes get a test automatically and fail until their
+view declares a budget. AsyncQueryBudgetTest runs them all again with the
+public pages served by main.async_views.
+"""
+import importlib.util
+import types
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import include, path, resolve, reverse
+
+from . import urls
+from .models import BlogPost, ContactMessage, Donation, Gallery, Partner, Testimonial
+
+# Rows created per table - more than any page shows per row-dependent query
+ROWS = 6
+
+# Pages behind login_required
+STAFF_ROUTES = {
+    'admincontrols', 'blogmanagement', 'blog_create', 'blog_edit', 'blog_delete',
+    'blog_autosave', 'blog_autosave_new',
+}
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('budget-admin', 'admin@example.com', 'password')
+        categories = [value for value, label in BlogPost.CATEGORY_CHOICES]
+        for i in range(ROWS):
+            author = User.objects.create_user(f'author-{i}')
+            # Every image field set, so per-image template work shows up too
+            partner = Partner.objects.create(name=f'Partner {i}', description='About the partner', logo=f'partners/{i}.png')
+            post = BlogPost.objects.create(
+                title=f'Post {i}', content='Post content ' * 20, author=author, status='published',
+                category=categories[i % 2], is_featured=True, featured_image=f'blog/{i}.jpg',
+            )
+            Testimonial.objects.create(
+                name=f'Person {i}', content='Thank you', is_approved=True, is_featured=i % 2 == 0,
+                image=f'testimonials/{i}.jpg',
+            )
+            Gallery.objects.create(title=f'Photo {i}', image=f'gallery/{i}.jpg', category='event', partner=partner, blog_post=post)
+            Donation.objects.create(donor_name=f'Donor {i}', donor_email='d@example.com', amount=1000, payment_method='bank', partner=partner, receipt_number=f'TEST-{i}')
+            ContactMessage.objects.create(name=f'Visitor {i}', email='v@example.com', subject='Hi', message='Hello')
+        cls.post = BlogPost.objects.first()
+
+    def setUp(self):
+        # Cached pages and counts would hide the queries being measured
+        cache.clear()
+
+    def route_kwargs(self, name):
+        return {
+            'blogpost_detail': {'slug': self.post.slug},
+            'blog_edit': {'pk': self.post.pk},
+            'blog_delete': {'pk': self.post.pk},
+            'blog_autosave': {'pk': self.post.pk},
+            'blog_archive': {'year': self.post.published_date.year, 'month': self.post.published_date.month},
+            'sitemap_section': {'section': f'blog-{self.post.category}'},
+            'blog_category_feed': {'category': self.post.category},
+            'blog_category_atom_feed': {'category': self.post.category},
+        }.get(name, {})
+
+    def check_route(self, pattern):
+        url = reverse(pattern.name, kwargs=self.route_kwargs(pattern.name))
+        self.assertTrue(
+            hasattr(resolve(url).func, 'query_budget'),
+            f'The view for {pattern.name!r} has no @query_budget',
+        )
+        if pattern.name in STAFF_ROUTES:
+            self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertLess(response.status_code, 500)
+
+
+def root_urlconf(async_public_views):
+    """The site's URLconf with main.urls loaded as it is for ASYNC_PUBLIC_VIEWS=async_public_views"""
+    with override_settings(ASYNC_PUBLIC_VIEWS=async_public_views):
+        spec = importlib.util.find_spec('main.urls')
+        main_urls = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(main_urls)
+    root = types.ModuleType('async_public_urls')
+    root.urlpatterns = [path('admin/', admin.site.urls), path('', include(main_urls))]
+    return root
+
+
+@override_settings(ROOT_URLCONF=root_urlconf(True))
+class AsyncQueryBudgetTest(QueryBudgetTest):
+    """The generated route tests again, with the public pages served by main.async_views"""
+
+    def test_public_pages_are_async(self):
+        self.assertTrue(iscoroutinefunction(resolve('/').func))
+
+
+def make_test(pattern):
+    def test(self):
+        self.check_route(pattern)
+    test.__doc__ = f'{pattern.name} stays within its query budget'
+    return test
+
+
+for pattern in urls.urlpatterns:
+    setattr(QueryBudgetTest, f'test_{pattern.name}', make_test(pattern))
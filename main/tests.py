@@ -1,3 +1,1176 @@
-from django.test import TestCase
+import gzip
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from datetime import date
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F, Model, QuerySet
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Page
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext, ContextList
+
+from . import (
+    analytics, archive, autocomplete, checks, compression, content, fonts, gallery_ingest, images, preload,
+    prerender, publishing, subscribers, throttle, warmup,
+)
+from .db import immediate_atomic
+from .search import get_blog_content_version, search_results
+from .middleware import REPLICA_PIN_COOKIE, get_page_cache_version, invalidate_page_cache, page_cache_key
+from .models import (
+    BlogArchiveMonth, BlogPost, ContactMessage, Gallery, MediaBlob, NewsletterSubscriber, PageViewDaily, Partner,
+    Testimonial,
+)
+from .routers import PrimaryReplicaRouter, get_replicas, use_replicas
+from .test_query_budgets import root_urlconf
+
+
+def use_temporary_directory(test, setting):
+    """Point a directory setting at a fresh temporary directory, removed after the test"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    override = override_settings(**{setting: directory.name})
+    override.enable()
+    test.addCleanup(override.disable)
+    return directory.name
+
+
+class DatabaseConcurrencyTest(TransactionTestCase):
+    """Mixed concurrent reads and writes must not fail with lock errors"""
+
+    THREADS = 8
+    ITERATIONS = 25
+
+    def setUp(self):
+        self.post = BlogPost.objects.create(title='Stress', content='Body', status='published')
+
+    def worker(self, number, errors):
+        try:
+            for i in range(self.ITERATIONS):
+                # Writes - view counts, contact form and newsletter
+                BlogPost.objects.filter(pk=self.post.pk).update(view_count=F('view_count') + 1)
+                ContactMessage.objects.create(
+                    name=f'Visitor {number}', email='visitor@example.com',
+                    subject='Hello', message='Stress test',
+                )
+                NewsletterSubscriber.objects.create(email=f'reader{number}-{i}@example.com')
+                # Reads - public pages
+                list(BlogPost.objects.filter(status='published')[:10])
+                ContactMessage.objects.count()
+        except OperationalError as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_mixed_reads_and_writes(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared between threads')
+        errors = []
+        threads = [threading.Thread(target=self.worker, args=(n, errors)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.ITERATIONS
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, total)
+        self.assertEqual(ContactMessage.objects.count(), total)
+        self.assertEqual(NewsletterSubscriber.objects.count(), total)
+
+    def read_modify_write(self, errors):
+        try:
+            for i in range(self.ITERATIONS):
+                # Read, then write what was read - a lost update or a lock error if these interleave
+                with immediate_atomic():
+                    views = BlogPost.objects.filter(pk=self.post.pk).values_list('view_count', flat=True).get()
+                    BlogPost.objects.filter(pk=self.post.pk).update(view_count=views + 1)
+                subscribers.subscribe(f'reader{i}@example.com')
+        except OperationalError as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_read_modify_write_transactions_take_turns(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('In-memory SQLite cannot be shared between threads')
+        errors = []
+        threads = [threading.Thread(target=self.read_modify_write, args=(errors,)) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, self.THREADS * self.ITERATIONS)
+        self.assertEqual(NewsletterSubscriber.objects.count(), self.ITERATIONS)
+
+
+@mock.patch('main.middleware.get_replicas', return_value=['replica'])
+@mock.patch('main.routers.get_replicas', return_value=['replica'])
+class ReplicaRoutingTest(TestCase):
+    """Reads from public pages go to the replica, everything else to the primary"""
+
+    def test_router_reads_from_replica_only_inside_block(self, *mocks):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(BlogPost), 'default')
+        with use_replicas():
+            self.assertEqual(router.db_for_read(BlogPost), 'replica')
+            self.assertEqual(router.db_for_write(BlogPost), 'default')
+        self.assertEqual(router.db_for_read(BlogPost), 'default')
+
+    def test_post_pins_visitor_to_primary(self, *mocks):
+        response = self.client.post('/contact/', {
+            'name': 'Visitor', 'email': 'visitor@example.com',
+            'inquiry_type': 'general', 'subject': 'Hello', 'message': 'Hi',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+        with mock.patch('main.middleware.use_replicas') as replica_block:
+            self.client.get('/our-partners/')
+        replica_block.assert_not_called()
+        self.client.cookies.pop(REPLICA_PIN_COOKIE)
+        with mock.patch('main.middleware.use_replicas') as replica_block:
+            self.client.get('/our-partners/')
+        replica_block.assert_called_once()
+
+
+@skipUnless(get_replicas(), 'Set DJANGO_DB_SQLITE_REPLICA to test against a replica database')
+class ReplicaDatabaseTest(TransactionTestCase):
+    """Runs the public pages against a real replica alias"""
+
+    databases = '__all__'
+
+    def test_public_page_reads_from_replica(self):
+        Partner.objects.create(name='Replica Partner', description='Read from the replica')
+        replica = get_replicas()[0]
+        with CaptureQueriesContext(connections[replica]) as queries:
+            response = self.client.get('/')
+        self.assertContains(response, 'Replica Partner')
+        self.assertTrue(queries.captured_queries)
+
+
+class AutocompleteTest(TestCase):
+    """Search-as-you-type answers from the in-memory index, kept current on save"""
+
+    def setUp(self):
+        autocomplete._index = None
+        BlogPost.objects.create(title='Empowering Communities Through Education', content='Body', status='published')
+        BlogPost.objects.create(title='Education Fund Launched', content='Body', status='published', category='news')
+        BlogPost.objects.create(title='Education Draft', content='Body', status='draft')
+
+    def titles(self, query):
+        response = self.client.get('/blogs/autocomplete/', {'q': query})
+        return [post['title'] for post in response.json()['posts']]
+
+    def test_matches_word_prefixes_without_queries(self):
+        self.titles('x')  # builds the index
+        with self.assertNumQueries(0):
+            # Titles starting with the query rank first; drafts are left out
+            self.assertEqual(self.titles('EDUC'), ['Education Fund Launched', 'Empowering Communities Through Education'])
+            self.assertEqual(self.titles('communities thr'), ['Empowering Communities Through Education'])
+            self.assertEqual(self.titles(''), [])
+
+    def test_saves_update_the_index_in_place(self):
+        self.titles('x')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='Clean Water Project', content='Body', status='published')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('water'), ['Clean Water Project'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.status = 'draft'
+            post.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('water'), [])
+
+
+class SearchCacheTest(TestCase):
+    """Repeated searches share cached result IDs until a post changes"""
+
+    def setUp(self):
+        self.post = BlogPost.objects.create(title='Flood Relief Update', content='Body', status='published')
+
+    def test_normalised_query_is_one_lookup(self):
+        search_results('Flood Relief', '')
+        with self.assertNumQueries(1):
+            blog_posts, news_posts = search_results('  FLOOD   relief ', '')
+        self.assertEqual(blog_posts, [self.post])
+
+    def test_post_change_expires_cached_searches(self):
+        search_results('flood', '')
+        version = get_blog_content_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(title='Flood Appeal', content='Body', status='published', category='news')
+            # Not before the commit - a search in between would cache the old results again
+            self.assertEqual(get_blog_content_version(), version)
+        blog_posts, news_posts = search_results('flood', '')
+        self.assertEqual([post.title for post in news_posts], ['Flood Appeal'])
+
+
+class ContentRenderingTest(TestCase):
+    """Blog content is sanitised and its code blocks highlighted once, when it is saved"""
+
+    def test_unsafe_urls_are_dropped(self):
+        rendered = content.render_content(
+            '<a href=" JaVaScript:alert(1)">a</a> <a href="https://example.com/">b</a> '
+            '<img src="data:image/svg+xml;base64,AA" alt="c"> <a href="/about/">d</a>'
+        )
+        self.assertNotIn('javascript', rendered.lower())
+        self.assertNotIn('data:', rendered)
+        self.assertIn('<a href="https://example.com/">b</a>', rendered)
+        self.assertIn('<img alt="c">', rendered)
+        self.assertIn('<a href="/about/">d</a>', rendered)
+
+    def test_event_handlers_are_dropped(self):
+        rendered = content.render_content('<p onclick="steal()" class="lead">Hi <img src="/x.png" onerror="steal()"></p>')
+        self.assertNotIn('steal', rendered)
+        self.assertIn('<p class="lead">Hi <img src="/x.png"></p>', rendered)
+
+    def test_svg_and_script_are_stripped(self):
+        rendered = content.render_content(
+            '<svg onload="steal()"><script>steal()</script><circle r="1"/></svg>'
+            '<style>body { display: none }</style><p>Kept</p>'
+        )
+        self.assertNotIn('svg', rendered)
+        self.assertNotIn('steal', rendered)
+        self.assertNotIn('display', rendered)
+        self.assertIn('<p>Kept</p>', rendered)
+
+    def test_new_tab_links_get_noopener(self):
+        rendered = content.render_content('<a href="https://example.com/" target="_blank" rel="opener">x</a>')
+        self.assertIn('rel="noopener noreferrer"', rendered)
+        self.assertNotIn('rel="opener"', rendered)
+
+    @skipUnless(content.highlight, 'Pygments is not installed')
+    def test_code_blocks_are_highlighted(self):
+        rendered = content.render_content('Intro\n\n<pre><code class="language-python">if a &lt; b:\n    pass</code></pre>')
+        self.assertIn('<pre class="highlight"><code class="language-python">', rendered)
+        self.assertIn('<span class="k">if</span>', rendered)
+        self.assertIn('&lt;', rendered)
+        # The <pre> is left out of the line break handling
+        self.assertNotIn('<br>', rendered)
+
+    def test_placeholder_lookalikes_in_text_stay_text(self):
+        rendered = content.render_content('<p>see AJIFCODEBLOCK3X here</p>')
+        self.assertIn('see AJIFCODEBLOCK3X here', rendered)
+        rendered = content.render_content('<pre>code</pre>\n\nAJIFCODEBLOCK0X')
+        self.assertEqual(rendered.count('<pre'), 1)
+        self.assertIn('AJIFCODEBLOCK0X', rendered)
+
+    def test_code_blocks_inside_attributes_stay_attribute_text(self):
+        rendered = content.render_content('<a href="/" title="<pre>x</pre>">link</a>\n\n<pre>real</pre>')
+        self.assertIn('<a href="/" title="&lt;pre&gt;x&lt;/pre&gt;">link</a>', rendered)
+        self.assertEqual(rendered.count('<pre'), 1)
+        self.assertNotIn('AJIFCODEBLOCK', rendered)
+
+
+class TestimonialListingTest(TestCase):
+    """"All" lists every approved testimonial once - featured first, past the first page too"""
+
+    def setUp(self):
+        cache.clear()
+        Testimonial.objects.create(name='Pending', content='Thanks', is_featured=True)
+
+    def create(self, featured, members):
+        # Members sort before the featured ones by display order, so only the featured-first rule keeps them back
+        for i in range(featured):
+            Testimonial.objects.create(name=f'Featured {i}', content='Thanks', is_approved=True, is_featured=True, display_order=100 + i)
+        for i in range(members):
+            Testimonial.objects.create(name=f'Member {i}', content='Thanks', is_approved=True, display_order=i)
+
+    def listed(self):
+        """Names on the testimonials page, then on each page loaded on scroll"""
+        response = self.client.get('/testimonials/')
+        pages = [[t.name for t in response.context['testimonials']]]
+        next_page = response.context['next_page']
+        while next_page:
+            page = self.client.get('/testimonials/more/', {'page': next_page, 'format': 'json'}).json()
+            pages.append([t['name'] for t in page['results']])
+            next_page = page['next_page']
+        return pages
+
+    def test_more_featured_than_a_page(self):
+        self.create(featured=15, members=3)
+        self.assertEqual(self.listed(), [
+            [f'Featured {i}' for i in range(12)],
+            ['Featured 12', 'Featured 13', 'Featured 14', 'Member 0', 'Member 1', 'Member 2'],
+        ])
+        self.assertContains(self.client.get('/testimonials/'), 'data-next-page="2"')
+
+    def test_fewer_featured_than_a_page(self):
+        self.create(featured=3, members=15)
+        self.assertEqual(self.listed(), [
+            ['Featured 0', 'Featured 1', 'Featured 2', *[f'Member {i}' for i in range(9)]],
+            [f'Member {i}' for i in range(9, 15)],
+        ])
+
+    def test_a_type_lists_its_own_from_the_first_page(self):
+        self.create(featured=15, members=3)
+        page = self.client.get('/testimonials/more/', {'page': 1, 'type': 'personal', 'format': 'json'}).json()
+        self.assertEqual(len(page['results']), 12)
+        self.assertEqual(page['next_page'], 2)
+
+
+class ProjectionQueryTest(TestCase):
+    """List pages load only their projection's columns and never go back for a deferred one"""
+
+    ROWS = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(cls.ROWS):
+            # Every field the templates can show is filled in, so rendering touches all of them
+            partner = Partner.objects.create(
+                name=f'Partner {i}', description='About', mission_statement='Mission', website='https://example.com/',
+                email='p@example.com', phone='123', facebook='https://facebook.com/p', twitter='https://twitter.com/p',
+                instagram='https://instagram.com/p', youtube='https://youtube.com/p', logo=f'partners/{i}.png',
+                featured_image=f'partners/featured/{i}.png', gallery_image_1=f'partners/gallery/{i}.png',
+            )
+            cls.post = BlogPost.objects.create(
+                title=f'Post {i}', content='Post content ' * 20, status='published', is_featured=True,
+                category=['blog', 'news'][i % 2], excerpt='' if i % 2 else 'Excerpt', featured_image=f'blog/{i}.jpg',
+            )
+            Testimonial.objects.create(
+                name=f'Person {i}', organization='Org', content='Thanks', is_approved=True, is_featured=True,
+                image=f'testimonials/{i}.jpg',
+            )
+            for category in ['impact', 'event']:
+                Gallery.objects.create(
+                    title=f'Photo {i}', description='Photo', image=f'gallery/{i}.jpg', category=category,
+                    is_featured=True, partner=partner, blog_post=cls.post,
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertProjected(self, objects, projection):
+        for obj in ([objects] if isinstance(objects, Model) else objects):
+            model = type(obj)
+            loaded = {model._meta.get_field(name).attname for name in model.objects.all().projections[projection]}
+            deferred = {field.attname for field in model._meta.concrete_fields} - loaded
+            # A deferred field the page used would have been loaded by a query of its own
+            self.assertEqual(obj.get_deferred_fields(), deferred, f'{model.__name__} {projection}')
+
+    def test_list_pages_query_once_per_list(self):
+        month = self.post.published_date
+        # These templates show none of their lists: the sync views' querysets are never
+        # evaluated, the async views fetch them up front
+        unshown = 2 if settings.ASYNC_PUBLIC_VIEWS else 0
+        pages = [
+            ('/', 3, {'featured_posts': 'listing', 'partners': 'card', 'testimonials': 'card'}),
+            ('/our-mission/', unshown, {}),
+            ('/about/', unshown, {}),
+            ('/our-partners/', unshown // 2, {}),
+            ('/testimonials/', 2, {'testimonials': 'card'}),
+            ('/testimonials/more/?page=1', 1, {'testimonials': 'card'}),
+            ('/testimonials/more/?page=1&format=json', 2, {}),
+            # The cards are dicts - a deferred column read would show up as an extra query
+            (f'/blogs/{month.year}/{month.month}/', 2, {}),
+            ('/blogs/?q=post', 4, {}),
+            # The last query is PageViewMiddleware counting the view
+            (f'/blogpost/{self.post.slug}/', 4, {'post': 'detail', 'related_posts': 'card'}),
+            ('/donate/', 1, {}),
+        ]
+        for url, queries, lists in pages:
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                for name, projection in lists.items():
+                    self.assertProjected(response.context[name], projection)
+
+
+@override_settings(THROTTLE_RATES={'contact': (2, 60)})
+class ThrottleTest(TestCase):
+    """POST floods get a 429 before the form is looked at; the window slides"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_request_over_the_limit_is_rejected_before_the_form(self):
+        data = {'name': 'Visitor', 'email': 'not-an-email', 'subject': 'Hi', 'message': 'Hello'}
+        for _ in range(2):
+            self.assertEqual(self.client.post('/contact/', data).status_code, 200)
+
+        with mock.patch('main.views.ContactForm') as form, self.assertNumQueries(0):
+            response = self.client.post('/contact/', data)
+        form.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 60)
+        self.assertEqual(throttle.rejected_counts(), {'contact': 1})
+
+        # Another address, and GETs, are not affected
+        self.assertEqual(self.client.post('/contact/', data, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.assertEqual(self.client.get('/contact/').status_code, 200)
+
+    def test_window_slides(self):
+        self.assertEqual(throttle.hit('contact', 'ip', 2, 60, now=100), (True, 0))
+        self.assertEqual(throttle.hit('contact', 'ip', 2, 60, now=110), (True, 0))
+        self.assertEqual(throttle.hit('contact', 'ip', 2, 60, now=115), (False, 5))
+        # Next window: the two earlier requests still count for most of it
+        self.assertEqual(throttle.hit('contact', 'ip', 2, 60, now=125), (True, 0))
+        self.assertEqual(throttle.hit('contact', 'ip', 2, 60, now=130), (False, 50))
+        # ...and less and less as it slides on; rejections weren't counted
+        self.assertEqual(throttle.hit('contact', 'ip', 2, 60, now=170), (True, 0))
+
+    @override_settings(THROTTLE_PROXY_COUNT=1)
+    def test_client_ip_behind_a_proxy(self):
+        request = RequestFactory().post('/contact/', HTTP_X_FORWARDED_FOR='1.1.1.1, 203.0.113.5', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(throttle.client_ip(request), '203.0.113.5')
+
+
+class SubscriberImportTest(TestCase):
+    """CSV imports treat emails case-insensitively, whether they update names or not"""
+
+    CSV = 'Email,Name\nREADER@Example.com,Reader\nnew@example.com,New\nNew@Example.com ,Again\nnot-an-email,Bad\n'
+
+    def setUp(self):
+        NewsletterSubscriber.objects.create(email='Reader@example.com', name='Old name')
+
+    def test_existing_addresses_are_ignored(self):
+        stats = subscribers.import_subscribers(subscribers.read_csv(io.StringIO(self.CSV)))
+        self.assertEqual(stats, {'created': 1, 'existing': 1, 'invalid': 1, 'duplicates': 1})
+        self.assertEqual(
+            dict(NewsletterSubscriber.objects.values_list('email', 'name')),
+            {'reader@example.com': 'Old name', 'new@example.com': 'New'},
+        )
+
+    def test_existing_addresses_get_the_new_name(self):
+        stats = subscribers.import_subscribers(subscribers.read_csv(io.StringIO(self.CSV)), update_names=True)
+        self.assertEqual(stats, {'created': 1, 'existing': 1, 'invalid': 1, 'duplicates': 1})
+        self.assertEqual(
+            dict(NewsletterSubscriber.objects.values_list('email', 'name')),
+            {'reader@example.com': 'Reader', 'new@example.com': 'New'},
+        )
+
+    def test_emails_are_stored_lower_cased(self):
+        # Anything that skips save() would hide the row from ON CONFLICT (email)
+        with self.assertRaises(IntegrityError):
+            NewsletterSubscriber.objects.update(email='Reader@Example.com')
+
+    def test_admin_form_accepts_mixed_case(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        response = self.client.post('/admin/main/newslettersubscriber/add/', {'email': 'New@Example.com', 'name': 'New', 'is_active': 'on'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(NewsletterSubscriber.objects.filter(email='new@example.com').exists())
+        # A case variant of an existing address is caught by the form, not the database
+        response = self.client.post('/admin/main/newslettersubscriber/add/', {'email': 'READER@example.com', 'is_active': 'on'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(NewsletterSubscriber.objects.count(), 2)
+
+
+class SubscriberEmailMigrationTest(TransactionTestCase):
+    """Migrating folds case-variant duplicate subscribers into the oldest one"""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([target])
+        executor.loader.build_graph()
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        call_command('migrate', 'main', verbosity=0)
+
+    def test_duplicates_are_dropped_and_emails_lower_cased(self):
+        apps = self.migrate(('main', '0003_blogpost_content_html'))
+        Subscriber = apps.get_model('main', 'NewsletterSubscriber')
+        first = Subscriber.objects.create(email='Reader@Example.com', name='First')
+        Subscriber.objects.create(email='reader@example.com', name='Second')
+        Subscriber.objects.create(email='READER@EXAMPLE.COM', name='Third')
+        other = Subscriber.objects.create(email='Other@Example.com', name='Other')
+
+        leaf = MigrationExecutor(connection).loader.graph.leaf_nodes('main')[0]
+        Subscriber = self.migrate(leaf).get_model('main', 'NewsletterSubscriber')
+        self.assertEqual(
+            sorted(Subscriber.objects.values_list('pk', 'email', 'name')),
+            [(first.pk, 'reader@example.com', 'First'), (other.pk, 'other@example.com', 'Other')],
+        )
+
+
+class FeedConditionalGetTest(TestCase):
+    """Feeds and sitemaps answer conditional GETs from the cache, and only change with their posts"""
+
+    def setUp(self):
+        cache.clear()
+        self.news = BlogPost.objects.create(title='Flood Appeal', content='Body', status='published', category='news')
+        BlogPost.objects.create(title='Clean Water', content='Body', status='published', category='blog')
+
+    def test_not_modified(self):
+        response = self.client.get('/blogs/news/feed/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Flood Appeal')
+        with self.assertNumQueries(0):
+            response = self.client.get('/blogs/news/feed/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get('/sitemap.xml')
+        response = self.client.get('/sitemap.xml', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/sitemap.xml', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_etag_changes_with_the_category(self):
+        news_etag = self.client.get('/blogs/news/feed/')['ETag']
+        blog_etag = self.client.get('/blogs/blog/feed/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.news.title = 'Flood Appeal Update'
+            self.news.save()
+
+        response = self.client.get('/blogs/news/feed/', HTTP_IF_NONE_MATCH=news_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], news_etag)
+        self.assertContains(response, 'Flood Appeal Update')
+        # Posts in another category didn't change
+        self.assertEqual(self.client.get('/blogs/blog/feed/', HTTP_IF_NONE_MATCH=blog_etag).status_code, 304)
+
+
+@override_settings(HTML_MINIFY=False)
+class PrerenderTest(TestCase):
+    """Static copies are the pages an anonymous visitor gets, with nothing per-visitor in them"""
+
+    def setUp(self):
+        use_temporary_directory(self, 'PRERENDER_ROOT')
+        cache.clear()
+        self.post = BlogPost.objects.create(title='Clean Water', content='Body', status='published')
+        BlogPost.objects.create(title='Flood Appeal', content='Body', status='published', category='news')
+
+    def test_output_matches_the_live_page(self):
+        paths = prerender.all_paths()
+        self.assertIn(f'/blogpost/{self.post.slug}/', paths)
+        for path in paths:
+            with self.subTest(path=path):
+                status, content = prerender.render_path(path)
+                self.assertEqual(status, 200)
+                self.assertEqual(content, self.client.get(path).content)
+                self.assertNotIn(b'csrfmiddlewaretoken', content)
+                self.assertNotIn(b'csrftoken', content)
+                self.assertNotIn(settings.SESSION_COOKIE_NAME.encode(), content)
+
+    def test_write_and_remove(self):
+        path = f'/blogpost/{self.post.slug}/'
+        self.assertEqual(prerender.write_path(path), (path, 200))
+        self.assertEqual(prerender.output_file(path).read_bytes(), prerender.render_path(path)[1])
+
+        BlogPost.objects.filter(pk=self.post.pk).update(status='draft')
+        self.assertEqual(prerender.write_path(path), (path, 404))
+        self.assertFalse(prerender.output_file(path).exists())
+
+
+class AsyncViewParityTest(TestCase):
+    """main.async_views answer every public page exactly as main.views does"""
+
+    # Context added by context processors and template tags, not by the views
+    IGNORED_CONTEXT = {'request', 'user', 'perms', 'messages', 'csrf_token', 'DEFAULT_MESSAGE_LEVELS', 'block', 'forloop'}
+    URLCONFS = {False: root_urlconf(False), True: root_urlconf(True)}
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('writer', first_name='Amina')
+        for i in range(5):
+            partner = Partner.objects.create(name=f'Partner {i}', description='About', logo=f'partners/{i}.png')
+            post = BlogPost.objects.create(
+                title=f'Flood relief {i}', content='Body ' * 30, author=author, status='published',
+                category='news' if i % 2 else 'blog', is_featured=i < 3, featured_image=f'blog/{i}.jpg',
+            )
+            Testimonial.objects.create(
+                name=f'Person {i}', content='Thanks', is_approved=True, is_featured=i % 2 == 0,
+                testimonial_type='personal' if i < 3 else 'partner',
+            )
+            Gallery.objects.create(title=f'Photo {i}', image=f'gallery/{i}.jpg', category='event', partner=partner, blog_post=post)
+        BlogPost.objects.create(title='Unpublished', content='Body', status='draft')
+        cls.post = BlogPost.objects.filter(status='published').first()
+
+    def plain(self, value):
+        """Context values reduced to what a page shows - model rows by primary key"""
+        if isinstance(value, Model):
+            return (type(value).__name__, value.pk)
+        if isinstance(value, dict):
+            return {key: self.plain(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple, QuerySet, Page)):
+            return [self.plain(item) for item in value]
+        if value is None or isinstance(value, (str, int, float, bool, date)):
+            return value
+        return type(value).__name__
+
+    def get(self, path, async_public_views):
+        cache.clear()
+        with override_settings(ROOT_URLCONF=self.URLCONFS[async_public_views]):
+            response = self.client.get(path)
+        context = {}
+        if response.context is not None:
+            # The page template's own context, without the templates it includes
+            page = response.context[0] if isinstance(response.context, ContextList) else response.context
+            for key, value in page.flatten().items():
+                if key not in self.IGNORED_CONTEXT:
+                    context[key] = self.plain(value)
+        return response.status_code, response.templates[0].name if response.templates else None, context
+
+    def test_pages_match(self):
+        paths = [
+            '/', '/our-mission/', '/about/', '/our-partners/', '/testimonials/',
+            '/blogs/', '/blogs/?category=news', '/blogs/?q=flood', '/blogs/?q=nothing-matches',
+            '/blogpost/', f'/blogpost/{self.post.slug}/',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                sync = self.get(path, False)
+                self.assertEqual(sync[0], 200)
+                self.assertEqual(self.get(path, True), sync)
+
+    def test_not_found_matches(self):
+        for path in ['/blogpost/no-such-post/', '/blogpost/unpublished/']:
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path, True)[0], 404)
+                self.assertEqual(self.get(path, False)[0], 404)
+
+
+class PageViewAnalyticsTest(TestCase):
+    """Hits go to the log without touching the database; the rollup counts them per day"""
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.log_dir.cleanup)
+        self.settings = override_settings(ANALYTICS_ENABLED=True, ANALYTICS_LOG_DIR=self.log_dir.name)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        # Nothing buffered may outlive the test and be written to the real log at exit
+        analytics.hit_log.buffer.clear()
+        self.addCleanup(analytics.hit_log.buffer.clear)
+
+    def test_hits_are_rolled_up_per_page_and_day(self):
+        post = BlogPost.objects.create(title='Clean Water', content='Body', status='published')
+        self.client.get('/')
+        self.client.get('/', HTTP_REFERER='https://www.example.com/links')
+        self.client.get(f'/blogpost/{post.slug}/')
+        self.client.get('/no-such-page/')
+        analytics.hit_log.flush()
+        self.assertFalse(PageViewDaily.objects.exists())
+        self.assertEqual(len(os.listdir(self.log_dir.name)), 1)
+
+        self.assertEqual(analytics.rollup(), (3, 1))
+        views = {(row.route, row.object_key, row.referrer_host): row.views for row in PageViewDaily.objects.all()}
+        self.assertEqual(views, {
+            ('home', '', ''): 1,
+            ('home', '', 'www.example.com'): 1,
+            ('blogpost_detail', post.slug, ''): 1,
+        })
+
+        # A later run adds to the same day's counters
+        self.client.get('/')
+        analytics.hit_log.flush()
+        self.assertEqual(analytics.rollup(), (1, 1))
+        self.assertEqual(PageViewDaily.objects.get(route='home', referrer_host='').views, 2)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class BlogAutosaveTest(TestCase):
+    """Autosave writes only the changed fields, and only over the version the editor saw"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('editor')
+        self.client.force_login(self.user)
+
+    def autosave(self, url, version, **fields):
+        return self.client.post(url, json.dumps({'version': version, 'fields': fields}), content_type='application/json')
+
+    def test_first_autosave_creates_a_draft_then_updates_it(self):
+        response = self.autosave('/blog-management/autosave/', None, title='Work in progress', content='First line')
+        self.assertEqual(response.status_code, 200)
+        post = BlogPost.objects.get(pk=response.json()['id'])
+        self.assertEqual((post.status, post.author, post.version), ('draft', self.user, 1))
+
+        response = self.autosave(response.json()['autosave_url'], 1, content='First line\n\nSecond line')
+        self.assertEqual(response.json()['version'], 2)
+        post.refresh_from_db()
+        self.assertEqual(post.title, 'Work in progress')
+        self.assertIn('Second line', post.content_html)
+
+    def test_stale_version_is_rejected(self):
+        post = BlogPost.objects.create(title='Shared', content='Original', author=self.user)
+        post.content = 'Edited in the full form'
+        post.save()
+
+        response = self.autosave(f'/blog-management/autosave/{post.pk}/', 1, content='Edited in an old tab')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+        post.refresh_from_db()
+        self.assertEqual(post.content, 'Edited in the full form')
+
+    def test_draft_autosaves_leave_the_public_caches_alone(self):
+        draft = BlogPost.objects.create(title='Draft', content='Body', author=self.user)
+        published = BlogPost.objects.create(title='Live', content='Body', author=self.user, status='published')
+        versions = get_page_cache_version(), get_blog_content_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autosave(f'/blog-management/autosave/{draft.pk}/', 1, content='Second draft', category='news')
+        self.assertEqual((get_page_cache_version(), get_blog_content_version()), versions)
+        self.assertFalse(BlogArchiveMonth.objects.filter(category='news').exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autosave(f'/blog-management/autosave/{published.pk}/', 1, content='Corrected')
+        self.assertEqual((get_page_cache_version(), get_blog_content_version()), (versions[0] + 1, versions[1] + 1))
+
+    def test_only_editable_fields_are_accepted(self):
+        post = BlogPost.objects.create(title='Draft', content='Body', author=self.user)
+        response = self.autosave(f'/blog-management/autosave/{post.pk}/', 1, status='published')
+        self.assertEqual(response.status_code, 400)
+        response = self.autosave(f'/blog-management/autosave/{post.pk}/', 1, category='not-a-category')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('category', response.json()['errors'])
+
+
+class PublishingTest(TestCase):
+    """Bulk publishing is one UPDATE that sets the published date and invalidates once"""
+
+    def test_publish_sets_dates_and_invalidates_once(self):
+        drafts = [BlogPost.objects.create(title=f'Draft {i}', content='Body') for i in range(3)]
+        published = BlogPost.objects.create(title='Live', content='Body', status='published')
+        version = get_blog_content_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                ids = publishing.publish(BlogPost.objects.all())
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "main_blogpost"')]
+        self.assertEqual(len(updates), 1)
+        self.assertCountEqual(ids, [post.pk for post in drafts])
+        self.assertFalse(BlogPost.objects.filter(published_date__isnull=True).exists())
+        self.assertEqual(BlogPost.objects.get(pk=published.pk).published_date, published.published_date)
+        self.assertEqual(get_blog_content_version(), version + 1)
+
+    def test_unpublish_and_feature(self):
+        post = BlogPost.objects.create(title='Live', content='Body', status='published')
+        self.assertEqual(publishing.set_featured(BlogPost.objects.all()), [post.pk])
+        self.assertEqual(publishing.set_featured(BlogPost.objects.all()), [])
+        self.assertEqual(publishing.unpublish(BlogPost.objects.all()), [post.pk])
+        post.refresh_from_db()
+        self.assertEqual((post.status, post.is_featured, post.version), ('draft', True, 3))
+
+
+class BlogArchiveTest(TestCase):
+    """The category/month index follows saves and bulk changes, and serves /blogs/YYYY/MM/"""
+
+    def test_index_follows_posts(self):
+        post = BlogPost.objects.create(title='Flood relief', content='Body', status='published', category='impact')
+        month = archive.month_of(post.published_date)
+        self.assertEqual(BlogArchiveMonth.objects.get(category='impact', month=month).post_count, 1)
+
+        post.category = 'news'
+        post.save()
+        self.assertFalse(BlogArchiveMonth.objects.filter(category='impact').exists())
+        self.assertEqual(BlogArchiveMonth.objects.get(category='news', month=month).post_count, 1)
+
+        publishing.unpublish(BlogPost.objects.all())
+        self.assertFalse(BlogArchiveMonth.objects.exists())
+        publishing.publish(BlogPost.objects.all())
+        self.assertEqual(BlogArchiveMonth.objects.get(category='news', month=month).post_count, 1)
+
+    def test_archive_page(self):
+        post = BlogPost.objects.create(title='School opening', content='Body', status='published')
+        month = archive.month_of(post.published_date)
+        response = self.client.get(f'/blogs/{month.year}/{month.month:02d}/')
+        self.assertContains(response, 'School opening')
+        self.assertEqual(response.context['archive_nav']['months'][0]['count'], 1)
+        self.assertEqual(self.client.get(f'/blogs/{month.year - 1}/{month.month:02d}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/blogs/{month.year}/13/').status_code, 404)
+
+
+class CompressionTest(TestCase):
+    """HTML is minified without touching <pre>/<script>, and cached pages are compressed once"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_minify_keeps_preformatted_blocks(self):
+        html = '<div>\n    <p>Hello   <b>world</b></p>  <!-- note -->\n</div><pre>  a\n    b</pre><script>\n  if (a  <  b) {}\n</script>'
+        self.assertEqual(
+            compression.minify_html(html),
+            '<div>\n<p>Hello <b>world</b></p>\n</div><pre>  a\n    b</pre><script>\n  if (a  <  b) {}\n</script>',
+        )
+
+    def test_negotiate(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0.5')
+        self.assertEqual(compression.negotiate(request), 'gzip')
+        self.assertEqual(compression.negotiate(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='identity')), None)
+
+    def test_cached_page_is_compressed_once(self):
+        first = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual((first['X-Page-Cache'], first['Content-Encoding']), ('MISS', 'gzip'))
+        self.assertIn('Accept-Encoding', first['Vary'])
+        with mock.patch.object(compression, 'compress') as compress:
+            second = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+            plain = self.client.get('/')
+        compress.assert_not_called()
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertEqual(gzip.decompress(second.content), plain.content)
+        self.assertNotIn('Content-Encoding', plain)
+        cache.clear()
+        with override_settings(HTML_MINIFY=False):
+            self.assertLess(len(plain.content), len(self.client.get('/').content))
+
+
+class PageCacheTest(TestCase):
+    """Invalidated pages are served stale while one request rebuilds them, and views are still counted"""
+
+    def setUp(self):
+        cache.clear()
+        self.post = BlogPost.objects.create(title='Clean Water', content='Body', status='published')
+        self.url = f'/blogpost/{self.post.slug}/'
+        self.key = page_cache_key(RequestFactory().get(self.url))
+        self.lock = f'{self.key}:lock'
+
+    def test_invalidated_page_is_served_stale_while_rebuilt(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'HIT')
+        invalidate_page_cache()
+        # Another request is rebuilding the page
+        cache.add(self.lock, 1)
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'STALE')
+        cache.delete(self.lock)
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'MISS')
+        self.assertIsNone(cache.get(self.lock))
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'HIT')
+
+    def test_cold_miss_waits_for_the_request_rendering_the_page(self):
+        cache.add(self.lock, 1)
+
+        def other_request_finishes(seconds):
+            cache.delete(self.lock)
+            self.assertEqual(Client().get(self.url)['X-Page-Cache'], 'MISS')
+
+        with mock.patch('main.middleware.time.sleep', side_effect=other_request_finishes) as sleep:
+            response = self.client.get(self.url)
+        sleep.assert_called_once()
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    @override_settings(PAGE_CACHE_LOCK_WAIT=0)
+    def test_cold_miss_renders_itself_after_waiting(self):
+        cache.add(self.lock, 1)
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response['X-Page-Cache']), (200, 'MISS'))
+        # The lock belongs to the other request
+        self.assertEqual(cache.get(self.lock), 1)
+
+    def test_unpublished_post_is_not_served_stale(self):
+        BlogPost.objects.create(title='Still Live', content='Body', status='published')
+        self.client.get(self.url)
+        BlogPost.objects.filter(pk=self.post.pk).update(status='draft')
+        invalidate_page_cache()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertIsNone(cache.get(self.key))
+
+    def test_views_are_counted_on_cache_hits(self):
+        states = [self.client.get(self.url)['X-Page-Cache'] for _ in range(3)]
+        self.assertEqual(states, ['MISS', 'HIT', 'HIT'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+
+
+@override_settings(TESTING=False)
+class SharedCacheCheckTest(TestCase):
+    """Startup fails without a cache every worker shares; the database cache on SQLite is a warning"""
+
+    def ids(self):
+        return [message.id for message in checks.check_shared_cache(None)]
+
+    def test_per_process_cache_is_an_error(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(self.ids(), ['main.E001'])
+        with override_settings(TESTING=True):
+            self.assertEqual(self.ids(), [])
+
+    def test_missing_client_package_is_an_error(self):
+        redis_cache = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}}
+        with override_settings(CACHES=redis_cache), mock.patch('main.checks.importlib.import_module', side_effect=ImportError):
+            self.assertEqual(self.ids(), ['main.E002'])
+        with override_settings(CACHES=redis_cache), mock.patch('main.checks.importlib.import_module'):
+            self.assertEqual(self.ids(), [])
+
+    def test_database_cache_on_sqlite_is_a_warning(self):
+        database_cache = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'ajif_cache'}}
+        with override_settings(CACHES=database_cache):
+            self.assertEqual(self.ids(), ['main.W001'] if connection.vendor == 'sqlite' else [])
+
+
+class PreloadTest(TestCase):
+    """Pages advertise their critical assets as preload links and 103 Early Hints"""
+
+    def test_link_header(self):
+        response = self.client.get('/')
+        self.assertIn('</static/css/output.css>; rel=preload; as=style', response['Link'])
+        self.assertIn('</static/assets/bg.png>; rel=preload; as=image', response['Link'])
+        self.assertNotIn('Link', self.client.get('/blog-manager/login/'))
+
+    def test_early_hints(self):
+        messages = []
+
+        async def app(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200})
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/', 'extensions': {'http.response.early_hint': {}}}
+        async_to_sync(preload.EarlyHints(app))(scope, None, send)
+        self.assertEqual([message['type'] for message in messages], ['http.response.early_hint', 'http.response.start'])
+        self.assertIn(b'</static/assets/bg.png>; rel=preload; as=image', messages[0]['links'])
+
+        messages.clear()
+        async_to_sync(preload.EarlyHints(app))({**scope, 'extensions': {}}, None, send)
+        self.assertEqual([message['type'] for message in messages], ['http.response.start'])
+
+
+class WarmUpTest(TestCase):
+    """Warm-up compiles, resolves, imports and primes; the app-loading and gunicorn paths call it"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_each_step_runs(self):
+        timings = warmup.warm_up()
+        self.assertEqual([step for step, items, seconds in timings], ['templates', 'urls', 'modules', 'caches'])
+        items = {step: items for step, items, seconds in timings}
+        self.assertGreater(items['templates'], 0)
+        self.assertGreater(items['urls'], 0)
+        self.assertEqual(items['modules'], len(warmup.LAZY_MODULES))
+        self.assertEqual(items['caches'], 3)
+        # Everything the first request would have filled in is there already
+        with self.assertNumQueries(0):
+            warmup.prime_caches()
+
+    def test_caches_can_be_skipped(self):
+        with mock.patch.object(warmup, 'prime_caches') as prime_caches, self.assertNumQueries(0):
+            timings = warmup.warm_up(caches=False)
+        prime_caches.assert_not_called()
+        self.assertEqual([step for step, items, seconds in timings], ['templates', 'urls', 'modules'])
+
+        out = io.StringIO()
+        with mock.patch.object(warmup, 'prime_caches') as prime_caches:
+            call_command('warmup', '--skip-caches', stdout=out)
+        prime_caches.assert_not_called()
+        self.assertIn('templates:', out.getvalue())
+        self.assertNotIn('caches:', out.getvalue())
+
+    def test_app_loading_warms_up_without_the_caches(self):
+        with mock.patch.object(warmup, 'warm_up') as warm_up:
+            with override_settings(WARMUP_ON_STARTUP=False):
+                apps.get_app_config('main').ready()
+            warm_up.assert_not_called()
+            with override_settings(WARMUP_ON_STARTUP=True):
+                apps.get_app_config('main').ready()
+            warm_up.assert_called_once_with(caches=False)
+
+    def test_gunicorn_warms_up_the_master(self):
+        spec = importlib.util.spec_from_file_location('gunicorn_conf', settings.BASE_DIR / 'gunicorn.conf.py')
+        gunicorn_conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(gunicorn_conf)
+        self.assertTrue(gunicorn_conf.preload_app)
+        with mock.patch.object(warmup, 'warm_up') as warm_up, mock.patch.object(connections, 'close_all') as close_all:
+            gunicorn_conf.when_ready(None)
+        warm_up.assert_called_once_with()
+        close_all.assert_called_once_with()
+
+
+class FontSubsetTest(TestCase):
+    """fonts.css gains a unicode-range subset rule per font, and rewriting it again is stable"""
+
+    CSS = """/* Local fonts */
+
+@font-face {
+  font-family: 'Quattrocento';
+  src: url('quattrocento-regular.woff2') format('woff2');
+  font-weight: 400;
+  font-display: swap;
+}
+
+.font-quattro { font-family: 'Quattrocento', serif; }
+"""
+
+    def test_rewrite_css(self):
+        self.assertEqual(fonts.unicode_range({0x41, 0x42, 0x43, 0x2014}), 'U+41-43, U+2014')
+        faces = fonts.font_faces(self.CSS)
+        self.assertEqual([filename for descriptors, filename in faces], ['quattrocento-regular.woff2'])
+
+        css = fonts.rewrite_css(self.CSS, faces, {0x41, 0x42}, {'quattrocento-regular.woff2'})
+        self.assertIn("src: url('quattrocento-regular.subset.woff2') format('woff2');\n  font-weight: 400;\n  font-display: swap;\n  unicode-range: U+41-42;", css)
+        self.assertTrue(css.startswith('/* Local fonts */'))
+        self.assertTrue(css.endswith(".font-quattro { font-family: 'Quattrocento', serif; }\n"))
+        self.assertEqual(fonts.rewrite_css(css, fonts.font_faces(css), {0x41, 0x42}, {'quattrocento-regular.woff2'}), css)
+
+
+class ContentAddressedStorageTest(TestCase):
+    """Identical uploads share one file, which goes when its last reference does"""
+
+    def setUp(self):
+        use_temporary_directory(self, 'MEDIA_ROOT')
+
+    def png(self, color='teal'):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def blob(self, name):
+        return MediaBlob.objects.filter(name=name).values_list('ref_count', flat=True).first()
+
+    def test_identical_uploads_share_a_blob(self):
+        partner = Partner.objects.create(name='Clinic', logo=self.png())
+        post = BlogPost.objects.create(title='Clinic opens', content='Body', featured_image=self.png())
+        name = partner.logo.name
+        self.assertTrue(name.startswith('cas/'))
+        self.assertEqual(post.featured_image.name, name)
+        self.assertEqual(self.blob(name), 2)
+        # Saving without a new upload adds no reference
+        partner.save()
+        self.assertEqual(self.blob(name), 2)
+
+    def test_replacing_drops_the_old_reference(self):
+        partner = Partner.objects.create(name='Clinic', logo=self.png())
+        post = BlogPost.objects.create(title='Clinic opens', content='Body', featured_image=self.png())
+        shared = partner.logo.name
+
+        partner.logo = self.png('red')
+        partner.save()
+        self.assertNotEqual(partner.logo.name, shared)
+        self.assertEqual((self.blob(shared), self.blob(partner.logo.name)), (1, 1))
+        # Still used by the post
+        self.assertTrue(partner.logo.storage.exists(shared))
+
+        post.featured_image = self.png('red')
+        post.save()
+        self.assertIsNone(self.blob(shared))
+        self.assertFalse(partner.logo.storage.exists(shared))
+        self.assertEqual(self.blob(partner.logo.name), 2)
+
+    def test_deleting_releases_the_file(self):
+        partner = Partner.objects.create(name='Clinic', logo=self.png())
+        post = BlogPost.objects.create(title='Clinic opens', content='Body', featured_image=self.png())
+        name, storage = partner.logo.name, partner.logo.storage
+
+        partner.delete()
+        self.assertEqual(self.blob(name), 1)
+        self.assertTrue(storage.exists(name))
+        post.delete()
+        self.assertIsNone(self.blob(name))
+        self.assertFalse(storage.exists(name))
+
+
+class GalleryIngestTest(TestCase):
+    """ZIP uploads become Gallery rows for their valid images only, stored under MEDIA_ROOT"""
+
+    def setUp(self):
+        use_temporary_directory(self, 'MEDIA_ROOT')
+
+    def png(self, size=(12, 8), color='teal'):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def archive(self, members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            for name, data in members:
+                zf.writestr(name, data)
+        buffer.seek(0)
+        return buffer
+
+    def test_images_in_an_archive(self):
+        archive = self.archive([
+            ('day_one/opening-ceremony.png', self.png()),
+            ('day_one/prize_giving.PNG', self.png((6, 9), 'red')),
+            ('day_one/', ''),
+        ])
+        created, rejected = gallery_ingest.ingest(archive=archive, category='event', workers=1)
+        self.assertEqual(rejected, [])
+        rows = {g.title: (g.image_width, g.image_height, bool(g.image_placeholder)) for g in Gallery.objects.all()}
+        self.assertEqual(rows, {'Opening Ceremony': (12, 8, True), 'Prize Giving': (6, 9, True)})
+        self.assertEqual(len(created), 2)
+
+    def test_non_images_are_skipped_or_rejected(self):
+        archive = self.archive([
+            ('notes.txt', 'not a photo'),
+            ('__MACOSX/._photo.png', 'resource fork'),
+            ('.hidden.png', self.png()),
+            ('broken.jpg', b'not really a jpeg'),
+            ('photo.png', self.png()),
+        ])
+        created, rejected = gallery_ingest.ingest(archive=archive, workers=1)
+        self.assertEqual(rejected, ['broken.jpg'])
+        self.assertEqual([g.title for g in created], ['Photo'])
+        # The rejected file was removed from storage again
+        self.assertEqual(MediaBlob.objects.count(), 1)
+
+    def test_member_paths_cannot_escape_media_root(self):
+        archive = self.archive([('../../../outside.png', self.png()), ('/etc/cron.d/evil.png', self.png((3, 3)))])
+        created, rejected = gallery_ingest.ingest(archive=archive, workers=1)
+        self.assertEqual(rejected, [])
+        media_root = os.path.realpath(settings.MEDIA_ROOT)
+        for gallery in created:
+            self.assertTrue(os.path.realpath(gallery.image.path).startswith(media_root + os.sep))
+        self.assertEqual(sorted(g.title for g in created), ['Evil', 'Outside'])
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(media_root), 'outside.png')))
+
+
+class ImageMeasurementTest(TestCase):
+    """Uploads store their size and a placeholder once; templates only read them"""
+
+    def setUp(self):
+        use_temporary_directory(self, 'MEDIA_ROOT')
+
+    def png(self, size=(40, 30)):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def test_measured_on_upload(self):
+        partner = Partner.objects.create(name='Clinic', logo=self.png())
+        self.assertEqual((partner.logo_width, partner.logo_height), (40, 30))
+        self.assertTrue(partner.logo_placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(partner.logo_placeholder), 1000)
+
+        partner = Partner.objects.projection('card').get(pk=partner.pk)
+        with self.assertNumQueries(0):
+            html = Template('{% load image_tags %}{% lazy_image partner.logo alt=partner.name %}').render(Context({'partner': partner}))
+        self.assertIn('width="40"', html)
+        self.assertIn('height="30"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('background:url(data:image/webp;base64,', html)
+
+        partner.logo = None
+        partner.save()
+        self.assertEqual((partner.logo_width, partner.logo_placeholder), (None, ''))
+
+    def test_backfill(self):
+        partner = Partner.objects.create(name='Clinic', logo=self.png((10, 20)))
+        Partner.objects.filter(pk=partner.pk).update(logo_width=None, logo_height=None, logo_placeholder='')
+        call_command('measure_images', stdout=io.StringIO())
+        partner.refresh_from_db()
+        self.assertEqual((partner.logo_width, partner.logo_height), (10, 20))
+        self.assertTrue(partner.logo_placeholder)
+        self.assertEqual(images.measured_fields(BlogPost), [BlogPost._meta.get_field('featured_image')])
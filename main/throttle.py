@@ -0,0 +1,79 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+REJECTED_KEY = 'throttle:rejected:{}'
+
+
+def get_rates():
+    """{url name: (requests, seconds)} from settings.THROTTLE_RATES"""
+    return getattr(settings, 'THROTTLE_RATES', {})
+
+
+def client_ip(request):
+    """
+    The visitor's address. With THROTTLE_PROXY_COUNT trusted proxies in front
+    of Django, it is taken from X-Forwarded-For (counting from the right, so a
+    client can't spoof it by sending its own header).
+    """
+    proxies = getattr(settings, 'THROTTLE_PROXY_COUNT', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',') if address.strip()]
+        if addresses:
+            return addresses[-min(proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def incr(key, timeout):
+    if not cache.add(key, 1, timeout):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, timeout)
+
+
+def hit(endpoint, ident, limit, period, now=None):
+    """
+    Count one request against a sliding window of `period` seconds.
+
+    The window is estimated from two fixed-window counters: the previous
+    window's count, weighted by how much of it still overlaps the sliding
+    window, plus the current window's count. That needs only two cache keys
+    per client and endpoint, however many requests it makes.
+
+    Returns (allowed, retry_after seconds). Rejected requests aren't counted,
+    so a client that backs off is let through again once the window slides.
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    elapsed = (now % period) / period
+    key = f'throttle:{endpoint}:{ident}'
+    current_key, previous_key = f'{key}:{window}', f'{key}:{window - 1}'
+
+    counts = cache.get_many([current_key, previous_key])
+    current, previous = counts.get(current_key, 0), counts.get(previous_key, 0)
+    if previous * (1 - elapsed) + current >= limit:
+        return False, max(1, math.ceil(period - now % period))
+
+    incr(current_key, period * 2)
+    return True, 0
+
+
+def record_rejection(endpoint):
+    incr(REJECTED_KEY.format(endpoint), None)
+
+
+def rejected_counts():
+    """{url name: requests rejected} for every throttled endpoint"""
+    keys = {endpoint: REJECTED_KEY.format(endpoint) for endpoint in get_rates()}
+    counts = cache.get_many(keys.values())
+    return {endpoint: counts.get(key, 0) for endpoint, key in keys.items()}
+
+
+def reset_rejected_counts():
+    cache.delete_many([REJECTED_KEY.format(endpoint) for endpoint in get_rates()])
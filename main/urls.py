@@ -1,19 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views, feeds
+
+# Read-only public pages use the async views when served through ASGI
+public = async_views if settings.ASYNC_PUBLIC_VIEWS else views
 
 urlpatterns = [
     # Main pages
-    path('', views.home, name='home'),
-    path('our-mission/', views.our_mission, name='our_mission'),
-    path('about/', views.about, name='about'),
-    path('our-partners/', views.our_partners, name='our_partners'),
-    path('testimonials/', views.testimonials, name='testimonials'),
+    path('', public.home, name='home'),
+    path('our-mission/', public.our_mission, name='our_mission'),
+    path('about/', public.about, name='about'),
+    path('our-partners/', public.our_partners, name='our_partners'),
+    path('testimonials/', public.testimonials, name='testimonials'),
     path('testimonials/submit/', views.submit_testimonial, name='submit_testimonial'),
+    path('testimonials/more/', views.testimonials_page, name='testimonials_page'),
 
     # Blog
-    path('blogs/', views.blogs, name='blogs'),
-    path('blogpost/', views.blogpost, name='blogpost'),  # Default blog post
-    path('blogpost/<slug:slug>/', views.blogpost, name='blogpost_detail'),  # Blog post with slug
+    path('blogs/', public.blogs, name='blogs'),
+    path('blogs/autocomplete/', views.blog_autocomplete, name='blog_autocomplete'),
+    path('blogs/<int:year>/<int:month>/', views.blog_archive, name='blog_archive'),  # Monthly archive
+    path('blogpost/', public.blogpost, name='blogpost'),  # Default blog post
+    path('blogpost/<slug:slug>/', public.blogpost, name='blogpost_detail'),  # Blog post with slug
+
+    # Sitemap and feeds for crawlers and feed readers
+    path('sitemap.xml', feeds.sitemap_index, name='sitemap'),
+    path('sitemap-<slug:section>.xml', feeds.sitemap_section, name='sitemap_section'),
+    path('blogs/feed/', feeds.blog_feed, name='blog_feed'),
+    path('blogs/feed/atom/', feeds.blog_feed, {'atom': True}, name='blog_atom_feed'),
+    path('blogs/<slug:category>/feed/', feeds.blog_feed, name='blog_category_feed'),
+    path('blogs/<slug:category>/feed/atom/', feeds.blog_feed, {'atom': True}, name='blog_category_atom_feed'),
 
     # Admin
     path('admin-login/', views.adminlogin, name='adminlogin'),
@@ -26,6 +41,8 @@ urlpatterns = [
     path('blog-management/create/', views.blog_create, name='blog_create'),
     path('blog-management/edit/<int:pk>/', views.blog_edit, name='blog_edit'),
     path('blog-management/delete/<int:pk>/', views.blog_delete, name='blog_delete'),
+    path('blog-management/autosave/', views.blog_autosave, name='blog_autosave_new'),
+    path('blog-management/autosave/<int:pk>/', views.blog_autosave, name='blog_autosave'),
 
     # Forms and actions
     path('contact/', views.contact, name='contact'),
@@ -1,20 +1,97 @@
+import json
+import math
+from datetime import date
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Q, Count, Sum
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.db.models import Count, F, Sum
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.contrib.auth import authenticate, login, logout
 from .models import (
     BlogPost, Partner, Testimonial, ContactMessage,
     Donation, NewsletterSubscriber, Gallery, SiteSettings
 )
+from .archive import archive_nav, published_in
+from .db import immediate_atomic
+from .autocomplete import DEFAULT_LIMIT, suggest
 from .forms import ContactForm, NewsletterForm, TestimonialForm, DonationForm
-
-
+from .middleware import get_page_cache_version
+from .query_budget import query_budget
+from .search import search_results
+from .subscribers import subscribe
+
+
+# Available images to cycle through for posts without a featured image
+BLOG_IMAGES = ['assets/uni.jpg', 'assets/water.jpg', 'assets/construction.jpg', 'assets/hockey.jpg', 'assets/student.jpg', 'assets/river.jpg', 'assets/darbar.jpg', 'assets/labour.jpg', 'assets/mission-preview.jpg']
+NEWS_IMAGES = ['assets/uni.jpg', 'assets/water.jpg', 'assets/construction.jpg', 'assets/hockey.jpg', 'assets/river.jpg', 'assets/labour.jpg', 'assets/student.jpg', 'assets/darbar.jpg', 'assets/mission-preview.jpg']
+
+# Default images based on post slug (for posts without featured_image)
+POST_IMAGE_MAP = {
+    'empowering-communities-through-education': 'assets/uni.jpg',
+    'healthcare-services-expand-rural-areas': 'assets/water.jpg',
+    'building-hope-new-community-center-opens': 'assets/construction.jpg',
+    'youth-sports-program-launches': 'assets/hockey.jpg',
+    'scholarship-recipients-share-stories': 'assets/student.jpg',
+    'clean-water-initiative-reaches-10000-families': 'assets/river.jpg',
+    'legal-aid-support-services': 'assets/darbar.jpg',
+    'vocational-training-creates-opportunities': 'assets/labour.jpg',
+    'partnership-local-organizations': 'assets/water.jpg',
+    'women-empowerment-literacy-programs': 'assets/uni.jpg',
+    'education-initiative-launches-rural-punjab': 'assets/uni.jpg',
+    'healthcare-services-expand-sindh': 'assets/water.jpg',
+    'infrastructure-development-balochistan': 'assets/construction.jpg',
+    'national-sports-initiative-youth': 'assets/hockey.jpg',
+    'clean-water-projects-benefit-thousands': 'assets/river.jpg',
+    'job-creation-program-shows-results': 'assets/labour.jpg',
+    'digital-literacy-program-reaches-villages': 'assets/student.jpg',
+    'legal-rights-awareness-campaign': 'assets/darbar.jpg',
+    'new-universities-open-remote-areas': 'assets/uni.jpg',
+    'housing-project-low-income-families': 'assets/construction.jpg',
+}
+
+# Testimonials rendered per infinite-scroll page (and at most on first paint)
+TESTIMONIALS_PAGE_SIZE = 12
+
+# Posts shown on a monthly archive page
+ARCHIVE_PAGE_SIZE = 50
+
+
+def post_cards(posts, images):
+    """Convert database posts (fetched with the 'listing' projection) to the template-friendly card format"""
+    cards = []
+    for idx, post in enumerate(posts):
+        cards.append({
+            'slug': post.slug,
+            'image': f'assets/{post.featured_image.name.split("/")[-1]}' if post.featured_image else images[idx % len(images)],
+            'title': post.title,
+            'category': post.get_category_display(),
+            'date': post.created_at.strftime('%b %d, %Y'),
+            'excerpt': post.excerpt or post.content_preview + '...',
+        })
+    return cards
+
+
+def assign_default_images(post, related_posts):
+    """Add an image attribute to posts that don't have a featured_image"""
+    if post and not post.featured_image:
+        post.image = POST_IMAGE_MAP.get(post.slug, 'assets/water.jpg')
+    for related in related_posts:
+        if not related.featured_image:
+            related.image = POST_IMAGE_MAP.get(related.slug, 'assets/water.jpg')
+
+
+@query_budget(3)
 def home(request):
     """Homepage with featured content"""
-    featured_posts = BlogPost.objects.filter(status='published', is_featured=True)[:3]
-    partners = Partner.objects.filter(is_active=True)[:4]
-    testimonials = Testimonial.objects.filter(is_approved=True, is_featured=True)[:3]
+    featured_posts = BlogPost.objects.filter(status='published', is_featured=True).projection('listing')[:3]
+    partners = Partner.objects.filter(is_active=True).projection('card')[:4]
+    testimonials = Testimonial.objects.filter(is_approved=True, is_featured=True).projection('card')[:3]
 
     context = {
         'featured_posts': featured_posts,
@@ -24,10 +101,11 @@ def home(request):
     return render(request, 'home.html', context)
 
 
+@query_budget(2)
 def our_mission(request):
     """Our mission page"""
-    testimonials = Testimonial.objects.filter(is_approved=True, testimonial_type='personal')[:2]
-    gallery_images = Gallery.objects.filter(is_featured=True, category='impact')[:3]
+    testimonials = Testimonial.objects.filter(is_approved=True, testimonial_type='personal').projection('card')[:2]
+    gallery_images = Gallery.objects.filter(is_featured=True, category='impact').projection('card')[:3]
 
     context = {
         'testimonials': testimonials,
@@ -36,10 +114,11 @@ def our_mission(request):
     return render(request, 'Our Mission.html', context)
 
 
+@query_budget(2)
 def about(request):
     """About page"""
-    partners = Partner.objects.filter(is_active=True)
-    gallery_images = Gallery.objects.filter(category='event')[:6]
+    partners = Partner.objects.filter(is_active=True).projection('card')
+    gallery_images = Gallery.objects.filter(category='event').projection('card')[:6]
 
     context = {
         'partners': partners,
@@ -48,9 +127,10 @@ def about(request):
     return render(request, 'about.html', context)
 
 
+@query_budget(1)
 def our_partners(request):
     """Partners page with all partner details"""
-    partners = Partner.objects.filter(is_active=True)
+    partners = Partner.objects.filter(is_active=True).projection('detail')
 
     context = {
         'partners': partners,
@@ -58,16 +138,111 @@ def our_partners(request):
     return render(request, 'our partners.html', context)
 
 
+def testimonial_type_counts():
+    """{testimonial_type: count} of approved testimonials - one grouped query, cached until content changes"""
+    key = f'testimonials:counts:{get_page_cache_version()}'
+    counts = cache.get(key)
+    if counts is None:
+        rows = (
+            Testimonial.objects.filter(is_approved=True).order_by()
+            .values('testimonial_type').annotate(count=Count('pk'))
+        )
+        counts = {row['testimonial_type']: row['count'] for row in rows}
+        cache.set(key, counts, None)
+    return counts
+
+
+def testimonial_filters(counts):
+    """Filter buttons for the testimonials page, each with its count"""
+    filters = [{'type': '', 'label': 'All', 'count': sum(counts.values())}]
+    for value, label in Testimonial.TESTIMONIAL_TYPE_CHOICES:
+        if counts.get(value):
+            filters.append({'type': value, 'label': label, 'count': counts[value]})
+    return filters
+
+
+def listed_testimonials(testimonial_type=''):
+    """
+    Approved testimonials in the order the testimonials page lists them.
+
+    "All" (no type) puts the featured ones first: its first page is the one
+    the page renders and the rest - featured or not - follow on scroll.
+    """
+    queryset = Testimonial.objects.filter(is_approved=True).projection('card')
+    if testimonial_type:
+        return queryset.filter(testimonial_type=testimonial_type)
+    return queryset.order_by('-is_featured', *Testimonial._meta.ordering)
+
+
+def testimonial_page_rows(queryset, page):
+    # One row more than a page tells us whether there is a next page without a COUNT
+    start = (page - 1) * TESTIMONIALS_PAGE_SIZE
+    return queryset[start:start + TESTIMONIALS_PAGE_SIZE + 1]
+
+
+def split_testimonial_page(rows, page):
+    """(testimonials, next page or None) from the rows testimonial_page_rows() fetched"""
+    rows = list(rows)
+    next_page = page + 1 if len(rows) > TESTIMONIALS_PAGE_SIZE else None
+    return rows[:TESTIMONIALS_PAGE_SIZE], next_page
+
+
+@query_budget(2)
 def testimonials(request):
-    """Testimonials page - display only"""
-    all_testimonials = Testimonial.objects.filter(is_approved=True)
+    """Testimonials page - the first page of them is rendered, the rest load on scroll"""
+    items, next_page = split_testimonial_page(testimonial_page_rows(listed_testimonials(), 1), 1)
 
     context = {
-        'testimonials': all_testimonials,
+        'testimonials': items,
+        'next_page': next_page,
+        'testimonial_filters': testimonial_filters(testimonial_type_counts()),
     }
     return render(request, 'testimonials.html', context)
 
 
+@query_budget(2)
+def testimonials_page(request):
+    """
+    One page of approved testimonials for infinite scroll, as an HTML
+    fragment or (with ?format=json) JSON.
+
+    ?type= filters by testimonial_type. Without it the pages follow on from
+    the one the testimonials page rendered (see listed_testimonials).
+    """
+    testimonial_type = request.GET.get('type', '')
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    queryset = listed_testimonials(testimonial_type)
+    items, next_page = split_testimonial_page(testimonial_page_rows(queryset, page), page)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [
+                {
+                    'id': t.pk,
+                    'name': t.name,
+                    'organization': t.organization,
+                    'testimonial_type': t.testimonial_type,
+                    'testimonial_type_display': t.get_testimonial_type_display(),
+                    'content': t.content,
+                    'image': t.image.url if t.image else None,
+                }
+                for t in items
+            ],
+            'next_page': next_page,
+            'counts': testimonial_type_counts(),
+        })
+
+    html = render_to_string('testimonial_cards.html', {'testimonials': items}, request=request)
+    response = HttpResponse(html)
+    response['X-Next-Page'] = next_page or ''
+    return response
+
+
+@query_budget(1)
 def submit_testimonial(request):
     """Submit testimonial page with form"""
     if request.method == 'POST':
@@ -87,59 +262,19 @@ def submit_testimonial(request):
     return render(request, 'submit_testimonial.html', context)
 
 
+@query_budget(4)
 def blogs(request):
     """Blog listing page with search and filtering"""
     query = request.GET.get('q', '')
     category = request.GET.get('category', '')
 
-    # Get published blog posts from database
-    db_posts = BlogPost.objects.filter(status='published')
-
-    # Apply search filter
-    if query:
-        db_posts = db_posts.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(excerpt__icontains=query)
-        )
-
-    # Apply category filter
-    if category:
-        db_posts = db_posts.filter(category=category)
+    # Published blog and news posts matching the search (cached by normalised query)
+    db_blog_posts, db_news_posts = search_results(query, category)
 
     # Use database posts if available; otherwise use dummy data
-    if db_posts.exists():
-        # Separate blog posts and news posts from database
-        db_blog_posts = db_posts.exclude(category='news')[:10]  # Blog, impact, update, event
-        db_news_posts = db_posts.filter(category='news')[:10]  # News only
-
-        # Available images to cycle through
-        blog_images = ['assets/uni.jpg', 'assets/water.jpg', 'assets/construction.jpg', 'assets/hockey.jpg', 'assets/student.jpg', 'assets/river.jpg', 'assets/darbar.jpg', 'assets/labour.jpg', 'assets/mission-preview.jpg']
-        news_images = ['assets/uni.jpg', 'assets/water.jpg', 'assets/construction.jpg', 'assets/hockey.jpg', 'assets/river.jpg', 'assets/labour.jpg', 'assets/student.jpg', 'assets/darbar.jpg', 'assets/mission-preview.jpg']
-
-        # Convert database blog posts to template-friendly format
-        blog_posts = []
-        for idx, post in enumerate(db_blog_posts):
-            blog_posts.append({
-                'slug': post.slug,
-                'image': f'assets/{post.featured_image.name.split("/")[-1]}' if post.featured_image else blog_images[idx % len(blog_images)],
-                'title': post.title,
-                'category': post.get_category_display(),
-                'date': post.created_at.strftime('%b %d, %Y'),
-                'excerpt': post.excerpt or post.content[:150] + '...',
-            })
-
-        # Convert database news posts to template-friendly format
-        news_posts = []
-        for idx, post in enumerate(db_news_posts):
-            news_posts.append({
-                'slug': post.slug,
-                'image': f'assets/{post.featured_image.name.split("/")[-1]}' if post.featured_image else news_images[idx % len(news_images)],
-                'title': post.title,
-                'category': post.get_category_display(),
-                'date': post.created_at.strftime('%b %d, %Y'),
-                'excerpt': post.excerpt or post.content[:150] + '...',
-            })
+    if db_blog_posts or db_news_posts:
+        blog_posts = post_cards(db_blog_posts, BLOG_IMAGES)
+        news_posts = post_cards(db_news_posts, NEWS_IMAGES)
     else:
         # Dummy blog data with existing static images - 10 blog posts
         blog_posts = [
@@ -390,7 +525,6 @@ def blogs(request):
     ]
 
     # Calculate total pages (3 posts per page)
-    import math
     total_pages = math.ceil(len(blog_posts) / 3)
 
     context = {
@@ -399,10 +533,54 @@ def blogs(request):
         'query': query,
         'category': category,
         'total_pages': total_pages,
+        'archive_nav': archive_nav(),
     }
     return render(request, 'blogs.html', context)
 
 
+@query_budget(2)
+def blog_archive(request, year, month):
+    """Posts published in one month, optionally of one category - counts come from the archive index"""
+    try:
+        archive_month = date(year, month, 1)
+    except ValueError:
+        raise Http404('No such month')
+    category = request.GET.get('category', '')
+
+    posts = published_in(archive_month).projection('listing')
+    if category:
+        posts = posts.filter(category=category)
+    posts = list(posts[:ARCHIVE_PAGE_SIZE])
+    if not posts:
+        raise Http404('No posts in this month')
+
+    blog_posts = post_cards([post for post in posts if post.category != 'news'], BLOG_IMAGES)
+    news_posts = post_cards([post for post in posts if post.category == 'news'], NEWS_IMAGES)
+    context = {
+        'blog_posts': blog_posts,
+        'news_posts': news_posts,
+        'query': '',
+        'category': category,
+        'total_pages': math.ceil(len(blog_posts) / 3),
+        'archive_month': archive_month,
+        'archive_nav': archive_nav(),
+    }
+    return render(request, 'blogs.html', context)
+
+
+# Only when this process has to (re)build its prefix index
+@query_budget(1)
+def blog_autocomplete(request):
+    """Search-as-you-type suggestions for the blog search box, from the in-memory title index"""
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    query = request.GET.get('q', '')[:100]
+    return JsonResponse({'query': query, **suggest(query, limit)})
+
+
+@query_budget(3)
 def blogpost(request, slug=None):
     """Individual blog post detail page - works with both database posts and dummy data"""
 
@@ -413,52 +591,19 @@ def blogpost(request, slug=None):
     if db_posts.exists():
         # Use database posts
         if slug:
-            post = get_object_or_404(BlogPost, slug=slug, status='published')
-            # Increment view count
-            post.view_count += 1
-            post.save(update_fields=['view_count'])
+            # The view count is kept by PageViewMiddleware, which also sees cached pages
+            post = get_object_or_404(BlogPost.objects.projection('detail').select_related('author'), slug=slug, status='published')
         else:
             # If no slug, show the latest post
-            post = db_posts.first()
+            post = db_posts.projection('detail').select_related('author').first()
 
         # Get related posts
         related_posts = BlogPost.objects.filter(
             status='published',
             category=post.category if post else 'blog'
-        ).exclude(id=post.id if post else None)[:3]
-
-        # Assign default images based on post slug (for posts without featured_image)
-        image_map = {
-            'empowering-communities-through-education': 'assets/uni.jpg',
-            'healthcare-services-expand-rural-areas': 'assets/water.jpg',
-            'building-hope-new-community-center-opens': 'assets/construction.jpg',
-            'youth-sports-program-launches': 'assets/hockey.jpg',
-            'scholarship-recipients-share-stories': 'assets/student.jpg',
-            'clean-water-initiative-reaches-10000-families': 'assets/river.jpg',
-            'legal-aid-support-services': 'assets/darbar.jpg',
-            'vocational-training-creates-opportunities': 'assets/labour.jpg',
-            'partnership-local-organizations': 'assets/water.jpg',
-            'women-empowerment-literacy-programs': 'assets/uni.jpg',
-            'education-initiative-launches-rural-punjab': 'assets/uni.jpg',
-            'healthcare-services-expand-sindh': 'assets/water.jpg',
-            'infrastructure-development-balochistan': 'assets/construction.jpg',
-            'national-sports-initiative-youth': 'assets/hockey.jpg',
-            'clean-water-projects-benefit-thousands': 'assets/river.jpg',
-            'job-creation-program-shows-results': 'assets/labour.jpg',
-            'digital-literacy-program-reaches-villages': 'assets/student.jpg',
-            'legal-rights-awareness-campaign': 'assets/darbar.jpg',
-            'new-universities-open-remote-areas': 'assets/uni.jpg',
-            'housing-project-low-income-families': 'assets/construction.jpg',
-        }
-
-        # Add image attribute to post if it doesn't have featured_image
-        if post and not post.featured_image:
-            post.image = image_map.get(post.slug, 'assets/water.jpg')
-
-        # Add images to related posts
-        for related in related_posts:
-            if not related.featured_image:
-                related.image = image_map.get(related.slug, 'assets/water.jpg')
+        ).exclude(id=post.id if post else None).projection('card')[:3]
+
+        assign_default_images(post, related_posts)
     else:
         # Use dummy data - same data as in blogs view
         # Dummy blog data
@@ -517,11 +662,13 @@ def blogpost(request, slug=None):
     return render(request, 'blogpost.html', context)
 
 
+@query_budget(0)
 def adminlogin(request):
     """Admin login page - redirects to Django admin"""
     return redirect('/admin/')
 
 
+@query_budget(8)
 def blog_manager_login(request):
     """Login page for Blog Managers"""
     if request.user.is_authenticated:
@@ -550,6 +697,7 @@ def blog_manager_login(request):
     return render(request, 'blog_manager_login.html')
 
 
+@query_budget(4)
 def blog_manager_logout(request):
     """Logout for Blog Managers"""
     logout(request)
@@ -557,6 +705,7 @@ def blog_manager_logout(request):
     return redirect('home')
 
 
+@query_budget(8)
 @login_required
 def admincontrols(request):
     """Admin controls dashboard"""
@@ -590,14 +739,16 @@ def admincontrols(request):
     return render(request, 'admincontrols.html', context)
 
 
+@query_budget(4)
 @login_required
 def blogmanagement(request):
     """Blog management page - Dashboard for Blog Managers"""
     # Get all posts created by the current user or all posts if superuser
+    # The list shows each post's author - join it rather than query it per row
     if request.user.is_superuser:
-        all_posts = BlogPost.objects.all()
+        all_posts = BlogPost.objects.select_related('author')
     else:
-        all_posts = BlogPost.objects.filter(author=request.user)
+        all_posts = BlogPost.objects.filter(author=request.user).select_related('author')
 
     # Filter by status
     status_filter = request.GET.get('status', '')
@@ -616,6 +767,7 @@ def blogmanagement(request):
     return render(request, 'blogmanagement.html', context)
 
 
+@query_budget(6)
 @login_required
 def blog_create(request):
     """Create a new blog post - Blog Managers can create drafts only"""
@@ -651,6 +803,7 @@ def blog_create(request):
     return render(request, 'blog_form.html', context)
 
 
+@query_budget(6)
 @login_required
 def blog_edit(request, pk):
     """Edit a blog post - Blog Managers cannot change status to published"""
@@ -695,6 +848,81 @@ def blog_edit(request, pk):
     return render(request, 'blog_form.html', context)
 
 
+# Fields the editor autosaves - status and featuring stay deliberate form submissions
+AUTOSAVE_FIELDS = ['title', 'excerpt', 'content', 'category', 'meta_title', 'meta_description']
+
+
+def autosave_response(post, saved):
+    return JsonResponse({
+        'id': post.pk,
+        'version': post.version,
+        'saved': saved,
+        'autosave_url': reverse('blog_autosave', args=[post.pk]),
+        'edit_url': reverse('blog_edit', args=[post.pk]),
+    })
+
+
+# A category change also looks up the archive month the post counted towards
+@query_budget(8)
+@require_POST
+@login_required
+def blog_autosave(request, pk=None):
+    """
+    Save the fields the editor changed since its last save, as JSON:
+    {"version": <version it last saw>, "fields": {"content": ...}}.
+
+    Only the given fields are written (the featured image is left to the
+    full form). The write goes through only if the post is still at the
+    version the editor saw; otherwise a 409 carries the current version.
+    Without a post yet (the create page), the first autosave makes a draft.
+    """
+    try:
+        payload = json.loads(request.body)
+        fields = payload.get('fields') or {}
+        expected = payload.get('version')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    if not isinstance(fields, dict) or set(fields) - set(AUTOSAVE_FIELDS):
+        return JsonResponse({'error': f'Only {", ".join(AUTOSAVE_FIELDS)} are autosaved'}, status=400)
+    if pk is not None and not isinstance(expected, int):
+        return JsonResponse({'error': 'The version the changes are based on is missing'}, status=400)
+
+    if pk is None:
+        post = BlogPost(author=request.user, status='draft')
+    else:
+        post = get_object_or_404(BlogPost, pk=pk)
+        if not request.user.is_superuser and post.author_id != request.user.pk:
+            return JsonResponse({'error': 'You do not have permission to edit this post.'}, status=403)
+
+    errors = {}
+    for name, value in fields.items():
+        try:
+            setattr(post, name, BlogPost._meta.get_field(name).clean(value, post))
+        except ValidationError as e:
+            errors[name] = e.messages
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    if pk is None:
+        if not post.title:
+            return JsonResponse({'errors': {'title': ['A title is needed before the draft can be saved.']}}, status=400)
+        post.save()
+        return autosave_response(post, sorted(fields))
+    if not fields:
+        return autosave_response(post, [])
+
+    with immediate_atomic():
+        # Claim the next version - fails if someone saved the post since the editor loaded it
+        claimed = BlogPost.objects.filter(pk=pk, version=expected).update(version=F('version') + 1)
+        if not claimed:
+            current = BlogPost.objects.filter(pk=pk).values_list('version', flat=True).first()
+            return JsonResponse({'error': 'conflict', 'version': current}, status=409)
+        post.version = expected + 1
+        post.save(update_fields=[*fields, 'updated_at'])
+    return autosave_response(post, sorted(fields))
+
+
+@query_budget(6)
 @login_required
 def blog_delete(request, pk):
     """Delete a blog post - Only superuser can delete"""
@@ -714,6 +942,7 @@ def blog_delete(request, pk):
     return render(request, 'blog_delete_confirm.html', context)
 
 
+@query_budget(1)
 def contact(request):
     """Contact form page"""
     if request.method == 'POST':
@@ -731,21 +960,24 @@ def contact(request):
     return render(request, 'contact.html', context)
 
 
+@query_budget(5)
 def newsletter_subscribe(request):
     """Newsletter subscription handler"""
     if request.method == 'POST':
         form = NewsletterForm(request.POST)
         if form.is_valid():
-            try:
-                form.save()
+            if subscribe(form.cleaned_data['email'], form.cleaned_data['name']):
                 messages.success(request, 'Successfully subscribed to our newsletter!')
-            except:
+            else:
                 messages.info(request, 'You are already subscribed to our newsletter.')
-            return redirect(request.META.get('HTTP_REFERER', 'home'))
+        else:
+            messages.error(request, 'Please enter a valid email address.')
+        return redirect(request.META.get('HTTP_REFERER', 'home'))
 
     return redirect('home')
 
 
+@query_budget(4)
 def donate(request):
     """Donation form page"""
     if request.method == 'POST':
@@ -759,7 +991,7 @@ def donate(request):
     else:
         form = DonationForm()
 
-    partners = Partner.objects.filter(is_active=True)
+    partners = Partner.objects.filter(is_active=True).projection('choice')
 
     context = {
         'form': form,
@@ -0,0 +1,109 @@
+"""
+Warm a process up before it serves requests.
+
+A fresh worker otherwise compiles every template, builds the URL resolver and
+imports the feed, sitemap and async view modules on its first requests. Run
+warm_up() in the master before it forks (the when_ready hook in
+gunicorn.conf.py, or WARMUP_ON_STARTUP without the caches) and every worker
+starts with all of that done. `manage.py warmup` runs it on its own, to time it.
+"""
+import importlib
+import logging
+import time
+from pathlib import Path
+
+import django
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = {'.html', '.xml', '.txt'}
+
+# Modules only imported by the first request that needs them
+LAZY_MODULES = [
+    'main.async_views',
+    'main.content',
+    'main.feeds',
+    'main.subscribers',
+    'django.contrib.sitemaps.views',
+    'django.contrib.syndication.views',
+    'django.utils.feedgenerator',
+]
+
+DJANGO_DIR = Path(django.__file__).resolve().parent
+
+
+def template_names(directory):
+    """Template names under one template directory, skipping static files kept alongside them"""
+    directory = Path(directory)
+    for path in sorted(directory.rglob('*')):
+        relative = path.relative_to(directory)
+        if path.suffix in TEMPLATE_SUFFIXES and relative.parts[0] != 'static':
+            yield relative.as_posix()
+
+
+def load_templates():
+    """Compile every project template into each engine's cached loader; returns the number loaded"""
+    loaded = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            # Django's own (admin) templates are left to load on first use - staff pages can wait
+            if Path(directory).resolve().is_relative_to(DJANGO_DIR):
+                continue
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError as e:
+                    logger.warning('Warm-up could not compile %s: %s', name, e)
+                    continue
+                loaded += 1
+    return loaded
+
+
+def resolve_urls():
+    """Build the URL resolver's reverse lookup tables; returns the number of URL names"""
+    resolver = get_resolver()
+    names = [name for name in resolver.reverse_dict if isinstance(name, str)]
+    for namespace, (_, sub_resolver) in resolver.namespace_dict.items():
+        names.extend(f'{namespace}:{name}' for name in sub_resolver.reverse_dict if isinstance(name, str))
+    return len(names)
+
+
+def import_modules():
+    for module in LAZY_MODULES:
+        importlib.import_module(module)
+    return len(LAZY_MODULES)
+
+
+def prime_caches():
+    """Fill the cached values every page reads; returns the number primed"""
+    from .autocomplete import get_index
+    from .middleware import get_page_cache_version
+    from .views import testimonial_type_counts
+
+    get_page_cache_version()
+    testimonial_type_counts()
+    get_index()
+    return 3
+
+
+def warm_up(caches=True):
+    """
+    Run each warm-up step and return [(step, items, seconds)].
+
+    Priming the caches queries the database, so it can be left out where
+    the database may not be ready yet (app loading, migrations).
+    """
+    steps = [('templates', load_templates), ('urls', resolve_urls), ('modules', import_modules)]
+    if caches:
+        steps.append(('caches', prime_caches))
+
+    timings = []
+    for step, run in steps:
+        start = time.perf_counter()
+        items = run()
+        timings.append((step, items, time.perf_counter() - start))
+    logger.info('Warm-up: %s', ', '.join(f'{step} {items} in {seconds * 1000:.0f}ms' for step, items, seconds in timings))
+    return timings